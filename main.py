@@ -21,8 +21,14 @@ Author: Aktyn
         
 Available arguments:
     nogui - doesn't display any GUI window
+    offscreen - renders GUI into memory without displaying any window
+    offscreen-fps=FPS - frequency of rendering GUI offscreen (default 30, 0 renders only on demand)
+    record="PATH" - saves rendered GUI frames to a video file (.avi, .mp4) or to a directory as PNG files
     use-epaper - uses ePaper display
+    simulate-hardware - uses simulated GPIO and SPI instead of Raspberry Pi hardware (used anyway when unavailable)
     disable-speaker - disables voice generator
+    camera-source="SOURCE" - uses given source instead of the camera (synthetic, video file or directory with images)
+    camera-pacing=fast - makes camera-source produce frames as fast as possible instead of in real time
     start-module="MODULE NAME" - automatically starts specified module (available modules: scoreboard, robot, workbench)
 ''')
     Core()
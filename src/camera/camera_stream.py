@@ -0,0 +1,110 @@
+import time
+import numpy as np
+
+from threading import Condition, Thread
+from typing import Optional
+from src.camera.frame_sources import FrameSource
+
+
+class CameraFrame:
+    def __init__(self, image: np.ndarray, sequence_number: int, timestamp: float):
+        """
+        Args:
+            image: captured image (it is a buffer reused by the stream, so it should be copied if kept for longer)
+            sequence_number: number of the frame counting from 1
+            timestamp: time.time() of the moment the frame was captured
+        """
+        self.image = image
+        self.sequence_number = sequence_number
+        self.timestamp = timestamp
+
+
+class CameraStream:
+    """
+    Captures frames in a separate thread, so the capture rate does not depend on the frame consumers.
+    Frames are read into a preallocated ring of buffers and the latest one is published with its sequence number.
+    """
+
+    def __init__(self, source: FrameSource, buffer_size=4):
+        self.__source = source
+
+        self.__buffers: list[np.ndarray] = []
+        self.__buffer_size = buffer_size
+        self.__buffer_index = 0
+
+        self.__condition = Condition()
+        self.__last_frame: Optional[CameraFrame] = None
+        self.__sequence_number = 0
+
+        self.__running = True
+        self.__capture_thread = Thread(target=self.__capture_loop, daemon=True)
+        self.__capture_thread.start()
+
+    def close(self):
+        self.__running = False
+        with self.__condition:
+            self.__condition.notify_all()
+        if self.__capture_thread is not None:
+            self.__capture_thread.join()
+            self.__capture_thread = None
+        self.__source.release()
+
+    @property
+    def source(self):
+        return self.__source
+
+    def is_opened(self):
+        return self.__source.is_opened()
+
+    def get_last_frame(self) -> Optional[CameraFrame]:
+        return self.__last_frame
+
+    def wait_for_frame(self, after_sequence_number=0, timeout: Optional[float] = None) -> Optional[CameraFrame]:
+        """
+        Blocks until a frame newer than the given one is captured
+
+        Args:
+            after_sequence_number: sequence number of the last frame processed by the caller
+            timeout: maximum waiting time in seconds (None means no limit)
+
+        Returns: the latest frame or None if there was no new frame within the timeout or the stream has been closed
+        """
+        with self.__condition:
+            has_new_frame = self.__condition.wait_for(
+                lambda: not self.__running or (self.__last_frame is not None and
+                                               self.__last_frame.sequence_number > after_sequence_number),
+                timeout
+            )
+            if not has_new_frame or not self.__running:
+                return None
+            return self.__last_frame
+
+    def __next_buffer(self) -> Optional[np.ndarray]:
+        if len(self.__buffers) == 0:
+            return None
+        buffer = self.__buffers[self.__buffer_index]
+        self.__buffer_index = (self.__buffer_index + 1) % len(self.__buffers)
+        return buffer
+
+    def __capture_loop(self):
+        while self.__running and self.__source.is_opened():
+            buffer = self.__next_buffer()
+            image = self.__source.read(buffer)
+            if image is None:
+                time.sleep(0.01)
+                continue
+
+            if image is not buffer:
+                if buffer is not None and image.shape == buffer.shape:
+                    np.copyto(buffer, image)
+                    image = buffer
+                else:
+                    # Buffers are allocated after the first frame since the actual resolution might differ from
+                    # the requested one
+                    self.__buffers = [image] + [np.empty_like(image) for _ in range(self.__buffer_size - 1)]
+                    self.__buffer_index = 1 % self.__buffer_size
+
+            with self.__condition:
+                self.__sequence_number += 1
+                self.__last_frame = CameraFrame(image, self.__sequence_number, time.time())
+                self.__condition.notify_all()
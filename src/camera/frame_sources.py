@@ -0,0 +1,177 @@
+import os
+import time
+import cv2
+import numpy as np
+
+from abc import abstractmethod
+from typing import Optional, Union
+from src.common.common_utils import get_argument_value
+
+
+class FrameSource:
+    """
+    Source of frames for CameraStream.
+    Recorded and synthetic sources can be paced in real time (like a camera) or produce frames as fast as possible.
+    """
+
+    def __init__(self, fps: float = 30., real_time=True):
+        self._fps = fps
+        self.__real_time = real_time
+        self.__next_frame_time = 0.
+
+    @property
+    def fps(self):
+        return self._fps
+
+    def is_opened(self) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+    @abstractmethod
+    def _read(self, buffer: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Args:
+            buffer: array the frame should be written into if it has matching shape
+
+        Returns: the frame or None if there is no frame available
+        """
+        pass
+
+    def read(self, buffer: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        if self.__real_time and self._fps > 0:
+            now = time.perf_counter()
+            if self.__next_frame_time > now:
+                time.sleep(self.__next_frame_time - now)
+            self.__next_frame_time = max(now, self.__next_frame_time) + 1. / self._fps
+        return self._read(buffer)
+
+
+class CameraSource(FrameSource):
+    def __init__(self, camera_id=0, resolution: tuple[int, int] = (640, 360)):
+        # Camera itself limits the frame rate
+        super().__init__(fps=0., real_time=False)
+        self.__capture = cv2.VideoCapture(camera_id)
+        self.__capture.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
+        self.__capture.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+        self._fps = self.__capture.get(cv2.CAP_PROP_FPS)
+
+    def is_opened(self):
+        return self.__capture.isOpened()
+
+    def release(self):
+        self.__capture.release()
+
+    def _read(self, buffer: Optional[np.ndarray]):
+        success, image = self.__capture.read(buffer)
+        return image if success else None
+
+
+class VideoFileSource(FrameSource):
+    def __init__(self, path: str, real_time=True, loop=True):
+        self.__capture = cv2.VideoCapture(path)
+        fps = self.__capture.get(cv2.CAP_PROP_FPS)
+        super().__init__(fps=fps if fps > 0 else 30., real_time=real_time)
+        self.__loop = loop
+
+    def is_opened(self):
+        return self.__capture.isOpened()
+
+    def release(self):
+        self.__capture.release()
+
+    def _read(self, buffer: Optional[np.ndarray]):
+        success, image = self.__capture.read(buffer)
+        if not success and self.__loop:
+            self.__capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, image = self.__capture.read(buffer)
+        return image if success else None
+
+
+class ImageDirectorySource(FrameSource):
+    __EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self, path: str, fps: float = 30., real_time=True, loop=True):
+        super().__init__(fps=fps, real_time=real_time)
+        self.__files = sorted(os.path.join(path, file_name) for file_name in os.listdir(path) if
+                              file_name.lower().endswith(ImageDirectorySource.__EXTENSIONS))
+        self.__loop = loop
+        self.__index = 0
+
+    def is_opened(self):
+        return self.__index < len(self.__files) or (self.__loop and len(self.__files) > 0)
+
+    def _read(self, buffer: Optional[np.ndarray]):
+        if self.__index >= len(self.__files):
+            if not self.__loop or len(self.__files) == 0:
+                return None
+            self.__index = 0
+
+        image = cv2.imread(self.__files[self.__index])
+        self.__index += 1
+        if image is not None and buffer is not None and buffer.shape == image.shape:
+            np.copyto(buffer, image)
+            return buffer
+        return image
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generates frames with a few shapes moving over a gradient background. Frames are deterministic for a given seed.
+    """
+
+    def __init__(self, resolution: tuple[int, int] = (640, 360), fps: float = 30., real_time=True, objects_count=3,
+                 seed=0):
+        super().__init__(fps=fps, real_time=real_time)
+        width, height = resolution
+        self.__background = np.zeros((height, width, 3), dtype=np.uint8)
+        self.__background[..., 0] = np.linspace(40, 200, width, dtype=np.uint8)[np.newaxis, :]
+        self.__background[..., 1] = np.linspace(60, 160, height, dtype=np.uint8)[:, np.newaxis]
+        self.__background[..., 2] = 90
+
+        random = np.random.default_rng(seed)
+        self.__positions = random.uniform((0, 0), (width, height), size=(objects_count, 2))
+        self.__velocities = random.uniform(-4, 4, size=(objects_count, 2))
+        self.__sizes = random.integers(20, max(21, min(width, height) // 4), size=objects_count)
+        self.__colors = random.integers(0, 256, size=(objects_count, 3))
+        self.__resolution = resolution
+
+    def _read(self, buffer: Optional[np.ndarray]):
+        image = buffer if buffer is not None and buffer.shape == self.__background.shape else \
+            np.empty_like(self.__background)
+        np.copyto(image, self.__background)
+
+        # Objects bounce off the frame edges
+        self.__positions += self.__velocities
+        for axis in range(2):
+            out_of_frame = (self.__positions[:, axis] < 0) | (self.__positions[:, axis] > self.__resolution[axis])
+            self.__velocities[out_of_frame, axis] *= -1
+            self.__positions[:, axis] = np.clip(self.__positions[:, axis], 0, self.__resolution[axis])
+
+        for i, ((x, y), size) in enumerate(zip(self.__positions.astype(int), self.__sizes)):
+            color = tuple(int(channel) for channel in self.__colors[i])
+            if i % 2 == 0:
+                cv2.rectangle(image, (x - size // 2, y - size // 2), (x + size // 2, y + size // 2), color,
+                              cv2.FILLED)
+            else:
+                cv2.circle(image, (x, y), size // 2, color, cv2.FILLED, cv2.LINE_AA)
+        return image
+
+
+def create_frame_source(camera_id: Union[int, str] = 0, resolution: tuple[int, int] = (640, 360)) -> FrameSource:
+    """
+    Creates a camera source unless a different one is given with camera-source argument
+    (synthetic, path to a video file or to a directory with images).
+    Argument camera-pacing=fast makes recorded and synthetic sources produce frames as fast as possible.
+    """
+    source = get_argument_value('camera-source')
+    real_time = get_argument_value('camera-pacing') != 'fast'
+
+    if source is None:
+        return CameraSource(camera_id, resolution)
+    if source == 'synthetic':
+        return SyntheticSource(resolution, real_time=real_time)
+    if os.path.isdir(source):
+        return ImageDirectorySource(source, real_time=real_time)
+    return VideoFileSource(source, real_time=real_time)
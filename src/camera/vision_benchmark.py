@@ -0,0 +1,71 @@
+import time
+import numpy as np
+
+from typing import Callable
+from src.camera.camera_stream import CameraStream
+from src.camera.frame_sources import create_frame_source
+from src.common.common_utils import get_argument_value
+
+
+def benchmark(stream: CameraStream, process: Callable[[np.ndarray], any], frames_count=300) -> dict[str, float]:
+    """
+    Processes frames from the stream the same way as the robot does (each new frame at most once) and measures
+    the throughput and latency from capturing a frame to getting the result
+
+    Returns: dictionary with statistics
+    """
+    latencies: list[float] = []
+    processing_times: list[float] = []
+    skipped_frames = 0
+    last_sequence_number = 0
+
+    start = time.time()
+    while len(latencies) < frames_count:
+        frame = stream.wait_for_frame(last_sequence_number, timeout=5.)
+        if frame is None:
+            print("No frames from the source")
+            break
+        if last_sequence_number > 0:
+            skipped_frames += frame.sequence_number - last_sequence_number - 1
+        last_sequence_number = frame.sequence_number
+
+        processing_start = time.time()
+        process(frame.image)
+        now = time.time()
+        processing_times.append(now - processing_start)
+        latencies.append(now - frame.timestamp)
+    duration = time.time() - start
+
+    if len(latencies) == 0:
+        return {}
+    return {
+        'frames': len(latencies),
+        'fps': len(latencies) / duration,
+        'skipped_frames': skipped_frames,
+        'processing_mean_ms': float(np.mean(processing_times)) * 1000,
+        'latency_mean_ms': float(np.mean(latencies)) * 1000,
+        'latency_p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'latency_p95_ms': float(np.percentile(latencies, 95)) * 1000,
+    }
+
+
+# Example: python -m src.camera.vision_benchmark camera-source=synthetic camera-pacing=fast model=detection frames=300
+if __name__ == "__main__":
+    model = get_argument_value('model') or 'detection'
+    frames = int(get_argument_value('frames') or 300)
+
+    if model == 'depth':
+        from src.depth_estimation.depth import DepthEstimator
+
+        processor = DepthEstimator(None)
+        process_frame = processor.estimate
+    else:
+        from src.object_detection.objectDetector import ObjectDetector
+
+        processor = ObjectDetector(None)
+        process_frame = processor.detect
+
+    camera_stream = CameraStream(create_frame_source())
+    print(benchmark(camera_stream, process_frame, frames))
+    camera_stream.close()
+    processor.close()
@@ -24,11 +24,21 @@ def show_gui():
     return "nogui" not in map(lambda arg: arg.lower(), sys.argv)
 
 
+@cache
+def use_offscreen_gui():
+    return "offscreen" in map(lambda arg: arg.lower(), sys.argv)
+
+
 @cache
 def use_epaper():
     return "use-epaper" in map(lambda arg: arg.lower(), sys.argv)
 
 
+@cache
+def simulate_hardware():
+    return "simulate-hardware" in map(lambda arg: arg.lower(), sys.argv)
+
+
 @cache
 def disable_speaker():
     return "disable-speaker" in map(lambda arg: arg.lower(), sys.argv)
@@ -1,47 +1,207 @@
 import os
+import time
 import numpy as np
 import cv2
 
+from concurrent.futures import CancelledError
+from threading import Thread, Lock
+from typing import Callable, Optional, NamedTuple
+from src.camera.camera_stream import CameraFrame
 from src.gui.core.gui import GUI
+from src.inference.vision_scheduler import VisionScheduler
+
+
+class DepthEstimation(NamedTuple):
+    """Relative inverse depth map (larger values are closer) of a camera frame."""
+    depth_map: np.ndarray
+    sequence_number: int
+    timestamp: float
+    image_size: tuple[int, int]
+    """Width and height of the camera frame the map was estimated from"""
 
 
 class DepthEstimator:
-    def __init__(self, gui: GUI):
+    # MiDaS v2.1 Small input size
+    INPUT_SIZE = (256, 256)
+    MODEL_NAME = 'depth'
+
+    def __init__(self, gui: Optional[GUI], backend: Optional[str] = None,
+                 scheduler: Optional[VisionScheduler] = None):
+        """
+        Args:
+            gui: GUI instance
+            backend: 'cuda' or 'cpu'; by default CUDA is used when it is available and works with the model
+            scheduler: scheduler running the background estimations (the model must be registered with MODEL_NAME)
+
+        Raises:
+            RuntimeError: if the model cannot be loaded
+        """
         self.__gui = gui
+        self.__scheduler = scheduler
 
         # model_name = "model-f6b98070.onnx" # MiDaS v2.1 Large
         model_name = "model-small.onnx"  # MiDaS v2.1 Small
 
-        self.__model = cv2.dnn.readNet(os.path.join(os.path.dirname(os.path.realpath(__file__)), model_name))
-
+        # readNet raises for missing or unparsable model files (eg. Git LFS pointers)
+        try:
+            self.__model = cv2.dnn.readNet(os.path.join(os.path.dirname(os.path.realpath(__file__)), model_name))
+        except cv2.error as e:
+            raise RuntimeError(f"Could not load the neural net! - Check path ({e})") from e
         if self.__model.empty():
-            print("Could not load the neural net! - Check path")
-
-        self.__model.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
-        self.__model.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+            raise RuntimeError("Could not load the neural net! - Check path")
+
+        self.__backend = self.__select_backend(backend)
+        print(f"Depth estimation backend: {self.__backend}")
+
+        self.__rgb_image: Optional[np.ndarray] = None
+        self.__input_lock = Lock()
+        self.__model_lock = Lock()
+
+        self.__background_thread: Optional[Thread] = None
+        self.__running = False
+        self.__last_estimation: Optional[DepthEstimation] = None
+        self.__estimation_lock = Lock()
+
+    @property
+    def backend(self):
+        return self.__backend
+
+    def __select_backend(self, backend: Optional[str]) -> str:
+        if backend != 'cpu' and cv2.cuda.getCudaEnabledDeviceCount() > 0:
+            self.__model.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+            self.__model.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+
+            # OpenCV built without CUDA support for DNN module fails only on the first forward pass
+            # noinspection PyBroadException
+            try:
+                self.__model.setInput(np.zeros((1, 3, self.INPUT_SIZE[1], self.INPUT_SIZE[0]), dtype=np.float32))
+                self.__model.forward()
+                return 'cuda'
+            except Exception as e:
+                print(f"CUDA depth estimation is not available: {e}")
+        elif backend == 'cuda':
+            print("CUDA depth estimation is not available: no CUDA devices")
+
+        self.__model.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.__model.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        return 'cpu'
 
     def close(self):
-        pass
-
-    def estimate(self, image: np.ndarray) -> np.ndarray:
-        img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # MiDaS v2.1 Large ( Scale : 1 / 255, Size : 384 x 384, Mean Subtraction : ( 123.675, 116.28, 103.53 ), Channels Order : RGB )
-        # blob = cv2.dnn.blobFromImage(img, 1/255., (384,384), (123.675, 116.28, 103.53), True, False)
-
-        # MiDaS v2.1 Small ( Scale : 1 / 255, Size : 256 x 256, Mean Subtraction : ( 123.675, 116.28, 103.53 ), Channels Order : RGB )
-        blob = cv2.dnn.blobFromImage(img, 1/255., (256,256), (123.675, 116.28, 103.53), True, False)
-
-        self.__model.setInput(blob)
-        output = self.__model.forward()
-
-        output = output[0, :, :]
-
-        img_height, img_width = img.shape[:2]
+        self.stop_background()
+
+    def estimate_raw(self, image: np.ndarray) -> np.ndarray:
+        """
+        Returns: relative inverse depth map at the model output resolution (256x256 float32)
+        """
+        return self.__forward(self.__create_blob(image))
+
+    def __create_blob(self, image: np.ndarray) -> np.ndarray:
+        """
+        Returns: model input created from the BGR image (the image is not referenced afterwards)
+        """
+        with self.__input_lock:
+            if self.__rgb_image is None or self.__rgb_image.shape != image.shape:
+                self.__rgb_image = np.empty_like(image)
+            img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self.__rgb_image)
+
+            # MiDaS v2.1 Large ( Scale : 1 / 255, Size : 384 x 384, Mean Subtraction : ( 123.675, 116.28, 103.53 ), Channels Order : RGB )
+            # blob = cv2.dnn.blobFromImage(img, 1/255., (384,384), (123.675, 116.28, 103.53), True, False)
+
+            # MiDaS v2.1 Small ( Scale : 1 / 255, Size : 256 x 256, Mean Subtraction : ( 123.675, 116.28, 103.53 ), Channels Order : RGB )
+            return cv2.dnn.blobFromImage(img, 1/255., self.INPUT_SIZE, (123.675, 116.28, 103.53), True, False)
+
+    def __forward(self, blob: np.ndarray) -> np.ndarray:
+        # The net is shared by the background estimation and direct calls
+        with self.__model_lock:
+            self.__model.setInput(blob)
+            output = self.__model.forward()
+
+        return output[0, :, :]
+
+    def estimate(self, image: np.ndarray, raw=False) -> np.ndarray:
+        """
+        Args:
+            image: BGR image
+            raw: return the model output (see estimate_raw) instead of the preview image
+
+        Returns: BGR preview image of the normalized depth at the input image resolution or the raw depth map
+        """
+        output = self.estimate_raw(image)
+        if raw:
+            return output
+
+        # Normalize the output before upscaling, so only the small map is processed in floating point
+        output = cv2.normalize(output, None, 0, 255, norm_type=cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+
+        img_height, img_width = image.shape[:2]
         output = cv2.resize(output, (img_width, img_height))
 
-        # Normalize the output
-        output = cv2.normalize(output, None, 0, 1, norm_type=cv2.NORM_MINMAX, dtype=cv2.CV_32F)
-
         # return np.stack((output*255,)*3, axis=-1)
-        return cv2.cvtColor(output * 255, cv2.COLOR_GRAY2BGR)
+        return cv2.cvtColor(output, cv2.COLOR_GRAY2BGR)
+
+    def get_last_estimation(self) -> Optional[DepthEstimation]:
+        """Returns the latest result of the background estimation"""
+        with self.__estimation_lock:
+            return self.__last_estimation
+
+    def start_background(self, wait_for_frame: Callable[[int, Optional[float]], Optional[CameraFrame]], fps=5.,
+                         on_estimation: Optional[Callable[[DepthEstimation], any]] = None):
+        """
+        Starts estimating raw depth maps of camera frames in a separate thread
+
+        Args:
+            wait_for_frame: function returning a frame newer than the given sequence number or None after the timeout
+                            (eg. GUI.wait_for_camera_frame)
+            fps: maximum estimation rate
+            on_estimation: function called from the background thread with each estimation
+        """
+        if self.__background_thread is not None:
+            return
+
+        self.__running = True
+        self.__background_thread = Thread(target=self.__background_loop, args=(wait_for_frame, fps, on_estimation),
+                                          daemon=True)
+        self.__background_thread.start()
+
+    def stop_background(self):
+        self.__running = False
+        if self.__background_thread is not None:
+            self.__background_thread.join()
+            self.__background_thread = None
+
+    def __background_loop(self, wait_for_frame: Callable[[int, Optional[float]], Optional[CameraFrame]], fps: float,
+                          on_estimation: Optional[Callable[[DepthEstimation], any]]):
+        last_sequence_number = 0
+        while self.__running:
+            start = time.time()
+
+            frame = wait_for_frame(last_sequence_number, 0.5)
+            if frame is None:
+                continue
+            last_sequence_number = frame.sequence_number
+
+            # noinspection PyBroadException
+            try:
+                image_height, image_width = frame.image.shape[:2]
+                # Frame image is a view into the camera buffer, so it is converted before waiting for the scheduler
+                blob = self.__create_blob(frame.image)
+                if self.__scheduler is not None:
+                    depth_map = self.__scheduler.submit(DepthEstimator.MODEL_NAME, self.__forward, blob).result()
+                else:
+                    depth_map = self.__forward(blob)
+                estimation = DepthEstimation(depth_map, frame.sequence_number, frame.timestamp,
+                                             (image_width, image_height))
+            except CancelledError:
+                continue
+            except Exception as e:
+                print(f"Depth estimation failed: {e}")
+                time.sleep(1.)
+                continue
+
+            with self.__estimation_lock:
+                self.__last_estimation = estimation
+            if on_estimation is not None:
+                on_estimation(estimation)
+
+            if fps > 0:
+                time.sleep(max(0., 1. / fps - (time.time() - start)))
@@ -0,0 +1,117 @@
+import math
+import numpy as np
+
+from typing import Optional
+from src.depth_estimation.depth import DepthEstimation
+from src.object_detection.objectDetector import Rect
+
+
+class RangeCalibration:
+    def __init__(self, inverse_depth_scale=0.0008, inverse_depth_shift=0.05, reference_area=0.1,
+                 reference_distance=0.5):
+        """
+        MiDaS predicts inverse depth up to an unknown scale and shift, so metric distance is estimated as
+        1 / (inverse_depth_scale * depth_value + inverse_depth_shift).
+        Distance from the bounding box alone assumes the box area is inversely proportional to the squared distance.
+
+        Args:
+            inverse_depth_scale: scale of the raw depth values in 1/m
+            inverse_depth_shift: shift of the raw depth values in 1/m
+            reference_area: bounding box area (relative to the image area) of a target at the reference distance
+            reference_distance: distance in meters of a target with the reference area
+        """
+        self.inverse_depth_scale = inverse_depth_scale
+        self.inverse_depth_shift = inverse_depth_shift
+        self.reference_area = reference_area
+        self.reference_distance = reference_distance
+
+    @staticmethod
+    def fit(samples: list[tuple[float, float]], reference_area=0.1, reference_distance=0.5) -> 'RangeCalibration':
+        """
+        Fits the depth calibration with least squares
+
+        Args:
+            samples: pairs of the target's median raw depth value (see TargetRangeEstimator.sample_depth) and its
+                     measured distance in meters (at least two different distances)
+            reference_area: see RangeCalibration
+            reference_distance: see RangeCalibration
+        """
+        depth_values = np.array([depth_value for depth_value, _ in samples], dtype=np.float64)
+        inverse_distances = 1. / np.array([distance for _, distance in samples], dtype=np.float64)
+        scale, shift = np.polyfit(depth_values, inverse_distances, 1)
+        return RangeCalibration(float(scale), float(shift), reference_area, reference_distance)
+
+
+class TargetRangeEstimator:
+    """
+    Estimates metric distance of a detected target by sampling the low resolution depth map inside its bounding box,
+    combined with a distance estimated from the bounding box size
+    """
+
+    def __init__(self, calibration: Optional[RangeCalibration] = None, box_margin=0.2, depth_weight=0.75,
+                 max_depth_age=0.5, max_distance=4.):
+        """
+        Args:
+            calibration: conversion of the raw values to meters
+            box_margin: part of the box size skipped at each side when sampling the depth, so the background around
+                        the target is mostly ignored
+            depth_weight: weight of the depth based estimate (the rest comes from the box size)
+            max_depth_age: maximum time in seconds between the depth estimation and the box for the depth to be used
+            max_distance: estimated distances are limited to this value in meters
+        """
+        self.__calibration = calibration or RangeCalibration()
+        self.__box_margin = box_margin
+        self.__depth_weight = depth_weight
+        self.__max_depth_age = max_depth_age
+        self.__max_distance = max_distance
+
+    @property
+    def calibration(self):
+        return self.__calibration
+
+    def sample_depth(self, box: Rect, estimation: DepthEstimation) -> Optional[float]:
+        """
+        Returns: median raw depth value inside the bounding box (given in the camera image coordinates)
+        """
+        map_height, map_width = estimation.depth_map.shape[:2]
+        image_width, image_height = estimation.image_size
+        scale_x = map_width / image_width
+        scale_y = map_height / image_height
+
+        margin_x = (box.right - box.left) * self.__box_margin
+        margin_y = (box.bottom - box.top) * self.__box_margin
+        left = int(np.clip((box.left + margin_x) * scale_x, 0, map_width - 1))
+        top = int(np.clip((box.top + margin_y) * scale_y, 0, map_height - 1))
+        right = int(np.clip(math.ceil((box.right - margin_x) * scale_x), left + 1, map_width))
+        bottom = int(np.clip(math.ceil((box.bottom - margin_y) * scale_y), top + 1, map_height))
+
+        samples = estimation.depth_map[top:bottom, left:right]
+        if samples.size == 0:
+            return None
+        return float(np.median(samples))
+
+    def estimate_from_box(self, box: Rect, image_size: tuple[int, int]) -> float:
+        area = max(1e-6, (box.right - box.left) * (box.bottom - box.top) / (image_size[0] * image_size[1]))
+        return self.__calibration.reference_distance * math.sqrt(self.__calibration.reference_area / area)
+
+    def estimate(self, box: Rect, image_size: tuple[int, int], timestamp: float,
+                 estimation: Optional[DepthEstimation] = None) -> float:
+        """
+        Args:
+            box: bounding box of the target in the camera image coordinates
+            image_size: camera image size
+            timestamp: capture time of the frame the box belongs to
+            estimation: latest depth estimation
+
+        Returns: estimated distance to the target in meters
+        """
+        distance = self.estimate_from_box(box, image_size)
+
+        if estimation is not None and abs(timestamp - estimation.timestamp) <= self.__max_depth_age:
+            depth_value = self.sample_depth(box, estimation)
+            inverse_distance = None if depth_value is None else \
+                self.__calibration.inverse_depth_scale * depth_value + self.__calibration.inverse_depth_shift
+            if inverse_distance is not None and inverse_distance > 0:
+                distance = self.__depth_weight * (1. / inverse_distance) + (1. - self.__depth_weight) * distance
+
+        return min(distance, self.__max_distance)
@@ -47,7 +47,10 @@ class Button(Label):
     def is_disabled(self):
         return self.__disabled
 
-    def aabb(self):
+    def box(self):
+        """
+        Returns: bounding box of the button's background which is also the clickable area
+        """
         (w, h), baseline = self._measurements
         if self._size is None:
             left_top = (self._pos[0] - w // 2 - self.__padding, self._pos[1] - h // 2 - self.__padding)
@@ -58,26 +61,38 @@ class Button(Label):
             right_bottom = (self._pos[0] + self._size[0] // 2, self._pos[1] + self._size[1] // 2)
             return left_top, right_bottom
 
+    def aabb(self):
+        (box_left, box_top), (box_right, box_bottom) = self.box()
+        (text_left, text_top), (text_right, text_bottom) = super().aabb()
+        margin = self.__border_width // 2 + 1
+        return (min(box_left - margin, text_left), min(box_top - margin, text_top)), \
+               (max(box_right + margin, text_right), max(box_bottom + margin, text_bottom))
+
     def draw(self, image: np.ndarray):
-        left_top, right_bottom = self.aabb()
+        left_top, right_bottom = self.box()
         cv2.rectangle(image, left_top, right_bottom,
                       color=Button.__HOVER_COLOR if self.__hover else self.__background_color,
                       thickness=(-1 if self.__fill else self.__border_width))
         super().draw(image)
 
     def is_point_inside(self, x: int, y: int):
-        left_top, right_bottom = self.aabb()
+        left_top, right_bottom = self.box()
         return left_top[0] <= x <= right_bottom[0] and left_top[1] <= y <= right_bottom[1]
 
     def toggle_hover(self, enable: bool):
         if enable == self.__hover:
             return False
         self.__hover = enable
+        self._changed()
 
         return True
 
     def set_border_width(self, width: int):
-        self.__border_width = width
+        if width != self.__border_width:
+            self.__border_width = width
+            self._changed()
 
     def set_fill(self, fill: bool):
-        self.__fill = fill
+        if fill != self.__fill:
+            self.__fill = fill
+            self._changed()
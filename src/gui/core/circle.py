@@ -9,5 +9,9 @@ class Circle(Widget):
         self.__background_color = background_color
         self.__radius = radius
 
+    def aabb(self):
+        return (self._pos[0] - self.__radius - 1, self._pos[1] - self.__radius - 1), \
+               (self._pos[0] + self.__radius + 1, self._pos[1] + self.__radius + 1)
+
     def draw(self, image: np.ndarray):
         cv2.circle(image, self._pos, self.__radius, self.__background_color, cv2.FILLED, cv2.LINE_AA)
@@ -0,0 +1,342 @@
+import numpy as np
+
+from threading import RLock
+from typing import Optional, Union
+from src.gui.core.spatial_grid import SpatialGrid
+from src.gui.core.widget import Widget
+
+# Region of the frame given as (left, top, right, bottom) with exclusive right and bottom edges
+Region = tuple[int, int, int, int]
+
+
+class Compositor:
+    """
+    Keeps widgets in layers ordered by z_index and draws them into a preallocated frame buffer.
+    Widgets notify the compositor about their changes, so only regions covered by changed widgets are repainted
+    unless a full redraw is requested (eg. after layout changes).
+    Widgets overlapping a dirty region are drawn unclipped into a scratch buffer and only the region is copied into
+    the frame, so the result is identical to a full repaint.
+    Layers marked as static are rasterized once into a cached image and composited with a single masked copy
+    until any of their widgets changes.
+    Widgets of interactive types are additionally kept in a spatial grid for fast hit-testing.
+    """
+    __MAX_DIRTY_REGIONS = 32
+    __FULL_REDRAW_AREA_FACTOR = 0.5
+
+    class __StaticLayer:
+        def __init__(self):
+            # Cache is rebuilt only after a frame without any changes in the layer so layers that keep changing
+            # (eg. walls following the camera) are drawn directly instead of being rasterized twice every frame
+            self.changed = True
+            self.image: Optional[np.ndarray] = None  # Layer drawn over black background (premultiplied colors)
+            self.mask: Optional[np.ndarray] = None  # Pixels fully covered by the layer
+            self.fringe: Optional[tuple[np.ndarray, np.ndarray]] = None  # Partially covered (anti-aliased) pixels
+            self.fringe_transmittance: Optional[np.ndarray] = None
+
+        def is_cached(self):
+            return self.image is not None
+
+        def cache(self, widgets: list[Widget], frame_shape: tuple[int, ...]):
+            over_black = np.zeros(frame_shape, dtype=np.uint8)
+            over_white = np.full(frame_shape, fill_value=255, dtype=np.uint8)
+            Compositor.draw_widgets(over_black, widgets)
+            Compositor.draw_widgets(over_white, widgets)
+
+            # Drawing over any background color B gives: over_black + B * transmittance
+            transmittance = (over_white.astype(np.float32) - over_black) / 255.
+            mask = (transmittance <= 0).all(axis=2)
+            fringe = np.nonzero((transmittance > 0).any(axis=2) & (transmittance < 1).any(axis=2))
+
+            self.image = over_black
+            self.mask = mask[..., np.newaxis]
+            self.fringe = fringe
+            self.fringe_transmittance = transmittance[fringe]
+
+        def composite(self, target: np.ndarray, region: Optional[Region] = None):
+            ys, xs = self.fringe
+            transmittance = self.fringe_transmittance
+            if region is None:
+                np.copyto(target, self.image, where=self.mask)
+            else:
+                left, top, right, bottom = region
+                np.copyto(target[top:bottom, left:right], self.image[top:bottom, left:right],
+                          where=self.mask[top:bottom, left:right])
+                inside = (ys >= top) & (ys < bottom) & (xs >= left) & (xs < right)
+                ys, xs, transmittance = ys[inside], xs[inside], transmittance[inside]
+
+            target[ys, xs] = np.clip(np.rint(self.image[ys, xs] + target[ys, xs] * transmittance), 0, 255)
+
+    def __init__(self, size: tuple[int, int], background_color: tuple[int, int, int],
+                 interactive_types: tuple[type, ...] = ()):
+        self.__size = size
+        self.__background_color = background_color
+        self.__img = self.__allocate_frame(size)
+        self.__scratch = self.__allocate_frame(size)
+        self.__lock = RLock()
+
+        # Layers are dicts used as ordered sets, so widgets can be removed without searching through all of them
+        self.__widgets: list[dict[Widget, None]] = []
+        self.__widget_layers: dict[Widget, int] = {}
+        self.__static_layers: dict[int, Compositor.__StaticLayer] = {}
+        self.__interactive_types = interactive_types
+        self.__interactive_widgets = SpatialGrid()
+        self.__drawn_regions: dict[Widget, Region] = {}
+        self.__changed_widgets: dict[Widget, None] = {}
+        self.__dirty_regions: list[Region] = []
+        self.__need_full_redraw = True
+        self.__has_camera_frame = False
+
+    def __allocate_frame(self, size: tuple[int, int]):
+        return np.full(shape=(size[1], size[0], 3), fill_value=self.__background_color, dtype=np.uint8)
+
+    def get_size(self):
+        return self.__size
+
+    def set_size(self, size: tuple[int, int]):
+        with self.__lock:
+            if size == self.__size:
+                return
+            self.__size = size
+            self.__img = self.__allocate_frame(size)
+            self.__scratch = self.__allocate_frame(size)
+            self.__need_full_redraw = True
+            for z_index in self.__static_layers:
+                self.__invalidate_static_layer(z_index)
+
+    def set_layer_static(self, z_index: int, static=True):
+        """
+        Static layer is rasterized once and reused in following frames until any of its widgets changes.
+        It is meant for layers with widgets that rarely change like walls or separators.
+        """
+        with self.__lock:
+            if static and z_index not in self.__static_layers:
+                self.__static_layers[z_index] = Compositor.__StaticLayer()
+            elif not static and z_index in self.__static_layers:
+                del self.__static_layers[z_index]
+
+    def invalidate(self):
+        with self.__lock:
+            self.__need_full_redraw = True
+
+    def get_widgets(self) -> list[Widget]:
+        """
+        Returns: list of all widgets ordered from the bottom to the top layer
+        """
+        with self.__lock:
+            return [widget for layer in self.__widgets for widget in layer]
+
+    def get_interactive_widgets_at(self, x: int, y: int) -> list[Widget]:
+        """
+        Returns: interactive widgets which bounding boxes might contain given point, ordered from the bottom to the
+        top layer
+        """
+        with self.__lock:
+            return sorted(self.__interactive_widgets.query(x, y), key=lambda widget: self.__widget_layers[widget])
+
+    def add_widgets(self, widgets: Union[tuple[Widget, ...], list[Widget]], z_index: int = 0):
+        with self.__lock:
+            self.__add_widgets(widgets, z_index)
+
+    def remove_widgets(self, *widgets: Widget):
+        with self.__lock:
+            self.__remove_widgets(widgets)
+
+    def replace_widgets(self, old_widgets: Union[tuple[Widget, ...], list[Widget]],
+                        new_widgets: Union[tuple[Widget, ...], list[Widget]], z_index: int = 0):
+        """
+        Removes old widgets and adds new ones at once, so no frame is rendered in between
+        """
+        with self.__lock:
+            self.__remove_widgets(old_widgets)
+            self.__add_widgets(new_widgets, z_index)
+
+    def __add_widgets(self, widgets: Union[tuple[Widget, ...], list[Widget]], z_index: int):
+        while len(self.__widgets) <= z_index:
+            self.__widgets.append({})
+        layer = self.__widgets[z_index]
+        for widget in widgets:
+            previous_z_index = self.__widget_layers.get(widget)
+            if previous_z_index is not None and previous_z_index != z_index:
+                del self.__widgets[previous_z_index][widget]
+                self.__invalidate_static_layer(previous_z_index)
+            layer[widget] = None
+            widget.set_change_listener(self.__on_widget_change)
+            self.__widget_layers[widget] = z_index
+            self.__changed_widgets[widget] = None
+            if isinstance(widget, self.__interactive_types):
+                self.__interactive_widgets.insert(widget)
+        self.__invalidate_static_layer(z_index)
+
+    def __remove_widgets(self, widgets: Union[tuple[Widget, ...], list[Widget]]):
+        for widget in widgets:
+            z_index = self.__widget_layers.get(widget)
+            if z_index is None:
+                continue
+            del self.__widgets[z_index][widget]
+            self.__invalidate_static_layer(z_index)
+            self.__forget_widget(widget)
+
+    def remove_all_widgets(self):
+        with self.__lock:
+            for layer in self.__widgets:
+                for widget in layer:
+                    widget.set_change_listener(None)
+                layer.clear()
+            self.__widgets.clear()
+            self.__widget_layers.clear()
+            self.__interactive_widgets.clear()
+            self.__static_layers.clear()
+            self.__drawn_regions.clear()
+            self.__changed_widgets.clear()
+            self.__dirty_regions.clear()
+            self.__need_full_redraw = True
+
+    def __forget_widget(self, widget: Widget):
+        widget.set_change_listener(None)
+        self.__widget_layers.pop(widget, None)
+        self.__interactive_widgets.remove(widget)
+        self.__changed_widgets.pop(widget, None)
+        drawn_region = self.__drawn_regions.pop(widget, None)
+        if drawn_region is not None:
+            self.__dirty_regions.append(drawn_region)
+
+    def __on_widget_change(self, widget: Widget):
+        with self.__lock:
+            self.__changed_widgets[widget] = None
+            if widget in self.__interactive_widgets:
+                self.__interactive_widgets.insert(widget)
+            self.__invalidate_static_layer(self.__widget_layers.get(widget))
+
+    def __invalidate_static_layer(self, z_index: Optional[int]):
+        # Layer is replaced instead of cleared since the render thread might be compositing the previous one
+        if z_index in self.__static_layers:
+            self.__static_layers[z_index] = Compositor.__StaticLayer()
+
+    @staticmethod
+    def draw_widgets(image: np.ndarray, widgets: list[Widget]):
+        """
+        Draws widgets in the given order. Consecutive widgets of the same type are drawn in batches.
+        """
+        start = 0
+        for end in range(1, len(widgets) + 1):
+            if end == len(widgets) or type(widgets[end]) is not type(widgets[start]):
+                type(widgets[start]).draw_batch(image, widgets[start:end])
+                start = end
+
+    def __widget_region(self, widget: Widget) -> Region:
+        (left, top), (right, bottom) = widget.aabb()
+        return max(0, left), max(0, top), min(self.__size[0], right + 1), min(self.__size[1], bottom + 1)
+
+    @staticmethod
+    def __intersects(region_a: Region, region_b: Region):
+        return region_a[0] < region_b[2] and region_b[0] < region_a[2] and \
+               region_a[1] < region_b[3] and region_b[1] < region_a[3]
+
+    @staticmethod
+    def __merge_regions(regions: list[Region]):
+        merged: list[Region] = []
+        for region in regions:
+            if region[0] >= region[2] or region[1] >= region[3]:
+                continue
+            # Keep merging until the region does not overlap any of already merged regions
+            overlapping = True
+            while overlapping:
+                overlapping = False
+                for i, other in enumerate(merged):
+                    if Compositor.__intersects(region, other):
+                        region = (min(region[0], other[0]), min(region[1], other[1]),
+                                  max(region[2], other[2]), max(region[3], other[3]))
+                        merged.pop(i)
+                        overlapping = True
+                        break
+            merged.append(region)
+        return merged
+
+    def __collect_dirty_regions(self) -> Optional[list[Region]]:
+        """
+        Returns: list of regions to repaint or None if the whole frame should be repainted
+        """
+        regions = self.__dirty_regions
+        for widget in self.__changed_widgets:
+            drawn_region = self.__drawn_regions.get(widget)
+            if drawn_region is not None:
+                regions.append(drawn_region)
+            new_region = self.__widget_region(widget)
+            self.__drawn_regions[widget] = new_region
+            regions.append(new_region)
+
+        regions = self.__merge_regions(regions)
+        area = sum((right - left) * (bottom - top) for left, top, right, bottom in regions)
+        if len(regions) > Compositor.__MAX_DIRTY_REGIONS or \
+                area > self.__size[0] * self.__size[1] * Compositor.__FULL_REDRAW_AREA_FACTOR:
+            return None
+        return regions
+
+    def render(self, camera_frame: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Args:
+            camera_frame: optional image drawn as a background of the whole frame
+
+        Returns: frame buffer with all widgets drawn
+        """
+        with self.__lock:
+            if camera_frame is not None or self.__has_camera_frame:
+                self.__need_full_redraw = True
+            self.__has_camera_frame = camera_frame is not None
+
+            regions = None if self.__need_full_redraw else self.__collect_dirty_regions()
+            if regions is None:
+                self.__drawn_regions = {widget: self.__widget_region(widget) for layer in self.__widgets for
+                                        widget in layer}
+            layers = [list(layer) for layer in self.__widgets]
+            drawn_regions = self.__drawn_regions.copy()
+            img = self.__img
+            scratch = self.__scratch
+
+            static_layers = [self.__static_layers.get(z_index) for z_index in range(len(layers))]
+            layers_to_cache = [z_index for z_index, static_layer in enumerate(static_layers) if
+                               static_layer is not None and not static_layer.changed and
+                               not static_layer.is_cached()]
+            for static_layer in self.__static_layers.values():
+                static_layer.changed = False
+
+            self.__changed_widgets.clear()
+            self.__dirty_regions = []
+            self.__need_full_redraw = False
+
+        for z_index in layers_to_cache:
+            static_layer = Compositor.__StaticLayer()
+            static_layer.cache(layers[z_index], img.shape)
+            with self.__lock:
+                # Skip the cache if the layer has been invalidated in the meantime
+                if self.__static_layers.get(z_index) is static_layers[z_index]:
+                    static_layer.changed = False
+                    self.__static_layers[z_index] = static_layer
+                    static_layers[z_index] = static_layer
+
+        if regions is None:
+            img[:] = self.__background_color
+            if camera_frame is not None:
+                height, width = camera_frame.shape[:2]
+                height, width = min(height, img.shape[0]), min(width, img.shape[1])
+                img[:height, :width] = camera_frame[:height, :width]
+
+            for layer, static_layer in zip(layers, static_layers):
+                if static_layer is not None and static_layer.is_cached():
+                    static_layer.composite(img)
+                    continue
+                self.draw_widgets(img, layer)
+            return img
+
+        for region in regions:
+            left, top, right, bottom = region
+            scratch[top:bottom, left:right] = self.__background_color
+
+            for layer, static_layer in zip(layers, static_layers):
+                if static_layer is not None and static_layer.is_cached():
+                    static_layer.composite(scratch, region)
+                    continue
+                self.draw_widgets(scratch, [widget for widget in layer if
+                                            self.__intersects(drawn_regions.get(widget, region), region)])
+            img[top:bottom, left:right] = scratch[top:bottom, left:right]
+        return img
@@ -0,0 +1,43 @@
+import os
+import cv2
+import numpy as np
+
+from typing import Optional
+
+
+class FrameRecorder:
+    """
+    Saves rendered frames either as a video file (.avi, .mp4) or as a sequence of PNG files in a directory
+    """
+    __VIDEO_CODECS = {'.avi': 'MJPG', '.mp4': 'mp4v'}
+
+    def __init__(self, path: str, fps: float = 30.):
+        self.__path = path
+        self.__fps = fps
+        self.__frames_count = 0
+        self.__video_writer: Optional[cv2.VideoWriter] = None
+
+        extension = os.path.splitext(path)[1].lower()
+        self.__codec = FrameRecorder.__VIDEO_CODECS.get(extension)
+        if self.__codec is None and not os.path.exists(path):
+            os.makedirs(path)
+
+    @property
+    def frames_count(self):
+        return self.__frames_count
+
+    def write(self, frame: np.ndarray):
+        if self.__codec is None:
+            cv2.imwrite(os.path.join(self.__path, f'frame_{self.__frames_count:06d}.png'), frame)
+        else:
+            if self.__video_writer is None:
+                height, width = frame.shape[:2]
+                self.__video_writer = cv2.VideoWriter(self.__path, cv2.VideoWriter_fourcc(*self.__codec),
+                                                      self.__fps, (width, height))
+            self.__video_writer.write(frame)
+        self.__frames_count += 1
+
+    def close(self):
+        if self.__video_writer is not None:
+            self.__video_writer.release()
+            self.__video_writer = None
@@ -1,39 +1,54 @@
+import time
 import numpy as np
 import cv2
-from cv2 import VideoCapture
-from src.common.common_utils import show_gui
+from src.camera.camera_stream import CameraFrame, CameraStream
+from src.camera.frame_sources import create_frame_source
+from src.common.common_utils import show_gui, use_offscreen_gui, get_argument_value
 from typing import Callable, Optional, Union
 from src.gui.core.button import Button
+from src.gui.core.compositor import Compositor
 from src.gui.core.widget import Widget
 from src.gui.views.view_base import ViewBase
 from threading import Thread
 
-if show_gui():
+if show_gui() or use_offscreen_gui():
     import sys
+    from collections import deque
+    from threading import Lock
+    from src.gui.core.frame_recorder import FrameRecorder
     from src.gui.core.gui_consts import GUIConsts
 
 
+    # Offscreen GUI renders into memory only, so it can be used without a display (eg. for benchmarks)
     class GUI:
         DEFAULT_SIZE = (640, 360)
+        __DEFAULT_OFFSCREEN_FPS = 30.
+        __RENDER_TIMINGS_BUFFER_SIZE = 600
 
         def __init__(self, on_close: Callable, size: tuple[int, int] = DEFAULT_SIZE):
             self.__running = False
-            self.__need_redraw = False
+            self.__offscreen = use_offscreen_gui()
             self.__title = GUIConsts.WINDOW_TITLE
             self.__on_close = on_close
             self.__size = size
             self.__current_view: Optional[ViewBase] = None
             self.key = 255
 
-            self.__camera_frames_history: list[np.ndarray] = []
-            self.__camera_frames_history_buffer_size = 60
-
             self.__background_color = (56, 50, 38)
-            self.__img = np.full(shape=(size[1], size[0], 3), fill_value=self.__background_color,
-                                 dtype=np.uint8)
+            self.__compositor = Compositor(size, self.__background_color, interactive_types=(Button,))
+            self.__hovered_buttons: dict[Button, None] = {}
+            self.__render_lock = Lock()
+            self.__render_timings: deque[float] = deque(maxlen=GUI.__RENDER_TIMINGS_BUFFER_SIZE)
+            self.__recorder: Optional[FrameRecorder] = None
+
+            offscreen_fps = get_argument_value('offscreen-fps')
+            self.__offscreen_fps = GUI.__DEFAULT_OFFSCREEN_FPS if offscreen_fps is None else float(offscreen_fps)
+
+            record_path = get_argument_value('record')
+            if record_path is not None:
+                self.start_recording(record_path)
 
-            self.__widgets: list[list[Widget]] = []
-            self.__camera_stream: Optional[VideoCapture] = None
+            self.__camera_stream: Optional[CameraStream] = None
 
             self.__window_thread = Thread(target=self.__init_window, daemon=True)
             self.__window_thread.start()
@@ -43,11 +58,12 @@ if show_gui():
 
             self.stop_camera_preview()
 
-            # noinspection PyBroadException
-            try:
-                cv2.destroyWindow(self.__title)
-            except BaseException:
-                pass
+            if not self.__offscreen:
+                # noinspection PyBroadException
+                try:
+                    cv2.destroyWindow(self.__title)
+                except BaseException:
+                    pass
             if self.__window_thread is not None:
                 # noinspection PyBroadException
                 try:
@@ -55,14 +71,14 @@ if show_gui():
                 except BaseException:
                     pass
                 self.__window_thread = None
-
-            del self.__img
+            self.stop_recording()
 
         def get_size(self):
             return self.__size
 
         def set_size(self, size: tuple[int, int]):
             self.__size = size
+            self.__compositor.set_size(size)
             # noinspection PyBroadException
             # try:
             #     cv2.resizeWindow(self.__title, size[0], size[1])
@@ -70,121 +86,155 @@ if show_gui():
             #     pass
 
         def set_title(self, title: str):
+            if self.__offscreen:
+                return
             # noinspection PyBroadException
             try:
                 cv2.setWindowTitle(self.__title, title)
             except BaseException:
                 pass
 
-        def start_camera_preview(self, resolution: tuple[int, int] = DEFAULT_SIZE, camera_id=0):
+        def start_camera_preview(self, resolution: tuple[int, int] = DEFAULT_SIZE, camera_id: Union[int, str] = 0):
             if self.__camera_stream is not None:
                 print("Camera preview already started")
                 return
             print("Starting camera preview. Camera id:", camera_id)
 
             try:
-                self.__camera_stream = cv2.VideoCapture(camera_id)
-                self.__camera_stream.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
-                self.__camera_stream.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+                self.__camera_stream = CameraStream(create_frame_source(camera_id, resolution))
             except BaseException as e:
                 print("Failed to start camera preview:", e)
 
         def stop_camera_preview(self):
             if self.__camera_stream is not None:
-                self.__camera_stream.release()
+                self.__camera_stream.close()
                 self.__camera_stream = None
-            self.__camera_frames_history.clear()
 
-        def get_last_camera_frame(self):
-            if len(self.__camera_frames_history) > 0:
-                return self.__camera_frames_history[-1]
-            return None
+        def get_last_camera_frame(self) -> Optional[np.ndarray]:
+            camera_stream = self.__camera_stream
+            frame = camera_stream.get_last_frame() if camera_stream is not None else None
+            return frame.image if frame is not None else None
+
+        def wait_for_camera_frame(self, after_sequence_number=0, timeout: Optional[float] = None) -> \
+                Optional[CameraFrame]:
+            """
+            Blocks until the camera captures a frame newer than the given one (see CameraStream.wait_for_frame)
+            """
+            camera_stream = self.__camera_stream
+            if camera_stream is None:
+                time.sleep(timeout if timeout is not None else 0.1)
+                return None
+            return camera_stream.wait_for_frame(after_sequence_number, timeout)
 
         def __init_window(self):
             self.__running = True
-            self.__need_redraw = True
             width, height = self.__size
 
-            cv2.namedWindow(self.__title, cv2.WINDOW_AUTOSIZE | cv2.WINDOW_NORMAL)
-            cv2.resizeWindow(self.__title, width, height)
-            # cv2.moveWindow(self.__title, 0, 0)
-            cv2.setMouseCallback(self.__title, self.__handle_mouse_event)
-
-            def __draw_frame(camera_frame: Optional[np.ndarray] = None):
-                if self.__need_redraw or camera_frame is not None:
-
-                    self.__img = np.full(shape=(self.__size[1], self.__size[0], 3), fill_value=self.__background_color,
-                                         dtype=np.uint8)
-
-                    if camera_frame is not None:
-                        h2, w2 = camera_frame.shape[:2]
-                        self.__img[:h2, :w2] = camera_frame
-
-                    for __widgets_layer in self.__widgets:
-                        for __widget in __widgets_layer:
-                            __widget.draw(self.__img)
-                    self.__need_redraw = False
-
-                # noinspection PyBroadException
-                try:
-                    if self.__running:
-                        cv2.imshow(self.__title, self.__img)
-                except BaseException:
-                    pass
+            if self.__offscreen:
+                # Frames are rendered only on demand
+                if self.__offscreen_fps <= 0:
+                    return
+            else:
+                cv2.namedWindow(self.__title, cv2.WINDOW_AUTOSIZE | cv2.WINDOW_NORMAL)
+                cv2.resizeWindow(self.__title, width, height)
+                # cv2.moveWindow(self.__title, 0, 0)
+                cv2.setMouseCallback(self.__title, self.__handle_mouse_event)
 
             while self.__running:
-                if cv2.getWindowProperty(self.__title, cv2.WND_PROP_VISIBLE) < 1:
+                frame_start = time.perf_counter()
+                if not self.__offscreen and cv2.getWindowProperty(self.__title, cv2.WND_PROP_VISIBLE) < 1:
                     if self.__on_close is not None:
                         self.__on_close()
                         break
                     else:
                         sys.exit(0)
 
-                if self.__camera_stream is not None and self.__camera_stream.isOpened():
-                    success, camera_image = self.__camera_stream.read()
-                    if success:
-                        height, width = camera_image.shape[:2]
-                        self.__camera_frames_history.append(camera_image)
-
-                        while len(self.__camera_frames_history) > self.__camera_frames_history_buffer_size:
-                            self.__camera_frames_history.pop(0)
-
-                        if width == self.__size[0] and height == self.__size[1]:
-                            for widgets_layer in self.__widgets:
-                                for widget in widgets_layer:
-                                    widget.draw(camera_image)
-                            # noinspection PyBroadException
-                            try:
-                                if self.__running:
-                                    cv2.imshow(self.__title, camera_image)
-                            except BaseException:
-                                pass
-                        else:
-                            __draw_frame(camera_image)
-                else:
-                    __draw_frame()
+                frame = self.__render(self.get_last_camera_frame())
+                if self.__offscreen:
+                    time.sleep(max(0., 1. / self.__offscreen_fps - (time.perf_counter() - frame_start)))
+                    continue
+
+                # noinspection PyBroadException
+                try:
+                    if self.__running:
+                        cv2.imshow(self.__title, frame)
+                except BaseException:
+                    pass
                 self.key = cv2.waitKey(1) & 0xFF
 
+        def __render(self, camera_image: Optional[np.ndarray] = None):
+            with self.__render_lock:
+                render_start = time.perf_counter()
+                frame = self.__compositor.render(camera_image)
+                self.__render_timings.append(time.perf_counter() - render_start)
+                if self.__recorder is not None:
+                    self.__recorder.write(frame)
+                return frame
+
+        def render(self) -> np.ndarray:
+            """
+            Renders a frame immediately. It is meant for offscreen GUI (eg. to render frames on demand in benchmarks).
+
+            Returns: copy of the rendered frame
+            """
+            return self.__render().copy()
+
+        def get_render_timings(self) -> list[float]:
+            """
+            Returns: durations of recently rendered frames in seconds
+            """
+            with self.__render_lock:
+                return list(self.__render_timings)
+
+        def start_recording(self, path: str):
+            """
+            Args:
+                path: video file (.avi or .mp4) or directory for PNG files
+            """
+            with self.__render_lock:
+                if self.__recorder is not None:
+                    self.__recorder.close()
+                self.__recorder = FrameRecorder(path, self.__offscreen_fps if
+                                                self.__offscreen and self.__offscreen_fps > 0 else
+                                                GUI.__DEFAULT_OFFSCREEN_FPS)
+
+        def stop_recording(self):
+            with self.__render_lock:
+                if self.__recorder is not None:
+                    self.__recorder.close()
+                    self.__recorder = None
+
         def redraw(self):
-            self.__need_redraw = True
+            """
+            Requests repainting the whole window. Changes of widgets are tracked automatically so this is only needed
+            after changes not related to any widget.
+            """
+            self.__compositor.invalidate()
 
         def __handle_mouse_event(self, event: int, x: int, y: int, _flags: any, _param: any):
-            for widgets_layer in self.__widgets:
-                for widget in widgets_layer:
-                    if type(widget) == Button:
-                        # noinspection PyTypeChecker
-                        button = widget  # type: Button
-                        if button.is_disabled():
-                            continue
-                        is_cursor_over = button.is_point_inside(x, y)
-                        if event == cv2.EVENT_MOUSEMOVE:
-                            if button.toggle_hover(is_cursor_over):
-                                self.__need_redraw = True
-                        elif event == cv2.EVENT_LBUTTONDOWN and is_cursor_over:
-                            button.on_mouse_down()
-                        elif event == cv2.EVENT_LBUTTONUP and is_cursor_over:
-                            button.on_mouse_up()
-                            button.click()
+            buttons_under_cursor: list[Button] = []
+            for widget in self.__compositor.get_interactive_widgets_at(x, y):
+                # noinspection PyTypeChecker
+                button = widget  # type: Button
+                if not button.is_disabled() and button.is_point_inside(x, y):
+                    buttons_under_cursor.append(button)
+
+            if event == cv2.EVENT_MOUSEMOVE:
+                hovered_buttons = dict.fromkeys(buttons_under_cursor)
+                for button in self.__hovered_buttons:
+                    if button not in hovered_buttons:
+                        button.toggle_hover(False)
+                for button in hovered_buttons:
+                    if button not in self.__hovered_buttons:
+                        button.toggle_hover(True)
+                self.__hovered_buttons = hovered_buttons
+            elif event == cv2.EVENT_LBUTTONDOWN:
+                for button in buttons_under_cursor:
+                    button.on_mouse_down()
+            elif event == cv2.EVENT_LBUTTONUP:
+                for button in buttons_under_cursor:
+                    button.on_mouse_up()
+                    button.click()
 
         def get_view(self):
             return self.__current_view
@@ -193,32 +243,41 @@ if show_gui():
             self.remove_all_widgets()
             self.__current_view = view
             view.load(self)
-            self.__need_redraw = True
+            self.__compositor.invalidate()
 
         def clear_view(self):
             self.__current_view = None
             self.remove_all_widgets()
 
         def add_widgets(self, widgets: Union[tuple[Widget, ...], list[Widget]], z_index: int = 0):
-            while len(self.__widgets) <= z_index:
-                self.__widgets.append([])
-            self.__widgets[z_index].extend(widgets)
-            self.__need_redraw = True
+            self.__compositor.add_widgets(widgets, z_index)
 
         def remove_widgets(self, *widgets: Widget):
-            # for widgets_layer in widgets:
+            self.__remove_hovered_buttons(widgets)
+            self.__compositor.remove_widgets(*widgets)
+
+        def replace_widgets(self, old_widgets: Union[tuple[Widget, ...], list[Widget]],
+                            new_widgets: Union[tuple[Widget, ...], list[Widget]], z_index: int = 0):
+            self.__remove_hovered_buttons(old_widgets)
+            self.__compositor.replace_widgets(old_widgets, new_widgets, z_index)
+
+        def __remove_hovered_buttons(self, widgets: Union[tuple[Widget, ...], list[Widget]]):
+            # Removed buttons must not be toggled by the next mouse move
             for widget in widgets:
-                for widgets_layer in self.__widgets:
-                    if widgets_layer.count(widget) > 0:
-                        widgets_layer.remove(widget)
-                        break
-            self.__need_redraw = True
+                if widget in self.__hovered_buttons:
+                    # noinspection PyTypeChecker
+                    button = widget  # type: Button
+                    button.toggle_hover(False)
+                    del self.__hovered_buttons[button]
 
         def remove_all_widgets(self):
-            for layer in self.__widgets:
-                layer.clear()
-            self.__widgets.clear()
-            self.__need_redraw = True
+            for button in self.__hovered_buttons:
+                button.toggle_hover(False)
+            self.__hovered_buttons = {}
+            self.__compositor.remove_all_widgets()
+
+        def set_layer_static(self, z_index: int, static=True):
+            self.__compositor.set_layer_static(z_index, static)
 
 else:
     # Mock GUI
@@ -226,65 +285,42 @@ else:
         DEFAULT_SIZE = (640, 360)
 
         def __init__(self, _on_close: Callable, _size: tuple[int, int] = DEFAULT_SIZE):
-            self.__running = False
-
-            self.__camera_stream: Optional[VideoCapture] = None
-            self.__camera_frames_history: list[np.ndarray] = []
-            self.__camera_frames_history_buffer_size = 60
-
-            self.__window_thread = Thread(target=self.__init_window, daemon=True)
-            self.__window_thread.start()
+            self.__camera_stream: Optional[CameraStream] = None
 
         def close(self):
-            self.__running = False
-
             self.stop_camera_preview()
 
-            if self.__window_thread is not None:
-                # noinspection PyBroadException
-                try:
-                    self.__window_thread.join()
-                except BaseException:
-                    pass
-                self.__window_thread = None
-
-        def start_camera_preview(self, resolution: tuple[int, int] = DEFAULT_SIZE, camera_id=0):
+        def start_camera_preview(self, resolution: tuple[int, int] = DEFAULT_SIZE, camera_id: Union[int, str] = 0):
             if self.__camera_stream is not None:
                 print("Camera preview already started")
                 return
             print("Starting camera preview. Camera id:", camera_id)
 
             try:
-                self.__camera_stream = cv2.VideoCapture(camera_id)
-                self.__camera_stream.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
-                self.__camera_stream.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+                self.__camera_stream = CameraStream(create_frame_source(camera_id, resolution))
             except BaseException as e:
                 print("Failed to start camera preview:", e)
 
         def stop_camera_preview(self):
             if self.__camera_stream is not None:
-                self.__camera_stream.release()
+                self.__camera_stream.close()
                 self.__camera_stream = None
-            self.__camera_frames_history.clear()
 
-        def get_last_camera_frame(self):
-            if len(self.__camera_frames_history) > 0:
-                cv2.imwrite("test.jpg", self.__camera_frames_history[-1])  # TODO: temporary for raspberry pi testing
-                return self.__camera_frames_history[-1]
+        def get_last_camera_frame(self) -> Optional[np.ndarray]:
+            camera_stream = self.__camera_stream
+            frame = camera_stream.get_last_frame() if camera_stream is not None else None
+            if frame is not None:
+                cv2.imwrite("test.jpg", frame.image)  # TODO: temporary for raspberry pi testing
+                return frame.image
             return None
 
-        def __init_window(self):
-            self.__running = True
-
-            while self.__running:
-                if self.__camera_stream is not None and self.__camera_stream.isOpened():
-                    success, camera_image = self.__camera_stream.read()
-                    if success:
-                        # height, width = camera_image.shape[:2]
-                        self.__camera_frames_history.append(camera_image)
-
-                        while len(self.__camera_frames_history) > self.__camera_frames_history_buffer_size:
-                            self.__camera_frames_history.pop(0)
+        def wait_for_camera_frame(self, after_sequence_number=0, timeout: Optional[float] = None) -> \
+                Optional[CameraFrame]:
+            camera_stream = self.__camera_stream
+            if camera_stream is None:
+                time.sleep(timeout if timeout is not None else 0.1)
+                return None
+            return camera_stream.wait_for_frame(after_sequence_number, timeout)
 
         def get_size(self):
             pass
@@ -298,6 +334,18 @@ else:
         def redraw(self):
             pass
 
+        def render(self) -> Optional[np.ndarray]:
+            return None
+
+        def get_render_timings(self) -> list[float]:
+            return []
+
+        def start_recording(self, path: str):
+            pass
+
+        def stop_recording(self):
+            pass
+
         def get_view(self):
             pass
 
@@ -313,5 +361,12 @@ else:
         def remove_widgets(self, *widgets: Widget):
             pass
 
+        def replace_widgets(self, old_widgets: Union[tuple[Widget, ...], list[Widget]],
+                            new_widgets: Union[tuple[Widget, ...], list[Widget]], z_index: int = 0):
+            pass
+
         def remove_all_widgets(self):
             pass
+
+        def set_layer_static(self, z_index: int, static=True):
+            pass
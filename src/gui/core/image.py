@@ -14,6 +14,10 @@ class Image(Widget):
         if height != self._size[1] or width != self._size[0]:
             raise ValueError("Image size does not match widget size")
         self.__img = image
+        self._changed()
+
+    def aabb(self):
+        return self._pos, (self._pos[0] + self._size[0], self._pos[1] + self._size[1])
 
     def draw(self, image: np.ndarray):
         height, width = self.__img.shape[:2]
@@ -1,11 +1,20 @@
 import numpy as np
 import cv2
 
+from functools import lru_cache
 from typing import Optional
 from src.gui.core.gui_consts import GUIConsts
 from src.gui.core.widget import Widget
 
 
+@lru_cache(maxsize=1024)
+def measure_text(text: str, font_size: float, font_thickness: int) -> tuple[tuple[int, int], int]:
+    """
+    Returns: ((width, height), baseline) of the text drawn with the font used by labels
+    """
+    return cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_size, font_thickness)
+
+
 class Label(Widget):
     def __init__(self, text: str, pos: tuple[int, int], font_size: float = 4, font_thickness=2,
                  text_color=(241, 239, 236),
@@ -19,33 +28,49 @@ class Label(Widget):
         self._measurements = self.__measure()
 
     def __measure(self):
-        return cv2.getTextSize(self.__text, cv2.FONT_HERSHEY_SIMPLEX, self.__font_size,
-                               self.__font_thickness)
+        return measure_text(self.__text, self.__font_size, self.__font_thickness)
 
     def set_text(self, text: str):
-        self.__text = text
+        if text != self.__text:
+            self.__text = text
+            self._measurements = self.__measure()
+            self._changed()
 
     def get_text(self):
         return self.__text
 
     def set_font_size(self, size: float):
-        self.__font_size = size
-        self._measurements = self.__measure()
+        if size != self.__font_size:
+            self.__font_size = size
+            self._measurements = self.__measure()
+            self._changed()
 
     def set_font_thickness(self, thickness: int):
-        self.__font_thickness = thickness
-        self._measurements = self.__measure()
+        if thickness != self.__font_thickness:
+            self.__font_thickness = thickness
+            self._measurements = self.__measure()
+            self._changed()
 
     def set_text_color(self, color: tuple[int, int, int]):
-        self.__text_color = color
+        if color != self.__text_color:
+            self.__text_color = color
+            self._changed()
 
-    def draw(self, image: np.ndarray):
+    def __text_origin(self):
         (w, h), baseline = self._measurements
         off_x = ((w // 2) if self.__align & GUIConsts.TextAlign.H_CENTER else 0)
         off_y = ((h // 2) if self.__align & GUIConsts.TextAlign.V_CENTER else 0)
+        return self._pos[0] - off_x, self._pos[1] + off_y
+
+    def aabb(self):
+        (w, h), baseline = self._measurements
+        x, y = self.__text_origin()
+        margin = self.__font_thickness + 1
+        return (x - margin, y - h - margin), (x + w + margin, y + baseline + margin)
+
+    def draw(self, image: np.ndarray):
         cv2.putText(image, text=self.__text,
-                    org=(self._pos[0] - off_x,
-                         self._pos[1] + off_y),
+                    org=self.__text_origin(),
                     fontFace=cv2.FONT_HERSHEY_SIMPLEX,
                     fontScale=self.__font_size, color=self.__text_color, thickness=self.__font_thickness,
                     lineType=cv2.LINE_AA,
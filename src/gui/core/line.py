@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 
+from itertools import groupby
 from src.gui.core.widget import Widget
 
 
@@ -12,11 +13,33 @@ class Line(Widget):
         self.__thickness = thickness
 
     def set_color(self, color: tuple[int, int, int]):
-        self.__color = color
+        if color != self.__color:
+            self.__color = color
+            self._changed()
 
     def set_points(self, pos_start: tuple[int, int], pos_end: tuple[int, int]):
-        self._pos = pos_start
-        self.__pos_end = pos_end
+        if pos_start != self._pos or pos_end != self.__pos_end:
+            self._pos = pos_start
+            self.__pos_end = pos_end
+            self._changed()
+
+    def aabb(self):
+        margin = self.__thickness + 1
+        return (min(self._pos[0], self.__pos_end[0]) - margin, min(self._pos[1], self.__pos_end[1]) - margin), \
+               (max(self._pos[0], self.__pos_end[0]) + margin, max(self._pos[1], self.__pos_end[1]) + margin)
 
     def draw(self, image: np.ndarray):
         cv2.line(image, self._pos, self.__pos_end, self.__color, thickness=self.__thickness, lineType=cv2.LINE_AA)
+
+    @staticmethod
+    def draw_batch(image: np.ndarray, widgets: list['Line']):
+        # Only consecutive lines are grouped to keep the drawing order of crossing lines
+        for (color, thickness), lines in groupby(widgets, key=lambda line: (line.__color, line.__thickness)):
+            lines = list(lines)
+            if len(lines) < Widget.MIN_BATCH_SIZE:
+                for line in lines:
+                    line.draw(image)
+                continue
+
+            points = np.array([(line._pos, line.__pos_end) for line in lines], dtype=np.int32)
+            cv2.polylines(image, list(points), False, color, thickness=thickness, lineType=cv2.LINE_AA)
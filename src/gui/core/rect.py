@@ -1,8 +1,9 @@
 import cv2
 import numpy as np
 
+from itertools import groupby
 from math import cos, sin, atan2, sqrt
-from src.gui.core.widget import Widget
+from src.gui.core.widget import Widget, fill_convex_polygons
 
 
 class Rect(Widget):
@@ -12,10 +13,20 @@ class Rect(Widget):
         self.__angle = 0
 
     def set_angle(self, angle):
-        self.__angle = angle
+        if angle != self.__angle:
+            self.__angle = angle
+            self._changed()
 
     def set_background_color(self, background_color):
-        self.__background_color = background_color
+        if background_color != self.__background_color:
+            self.__background_color = background_color
+            self._changed()
+
+    def aabb(self):
+        half_width = (abs(self._size[0] * cos(self.__angle)) + abs(self._size[1] * sin(self.__angle))) / 2.0
+        half_height = (abs(self._size[0] * sin(self.__angle)) + abs(self._size[1] * cos(self.__angle))) / 2.0
+        return (int(self._pos[0] - half_width) - 1, int(self._pos[1] - half_height) - 1), \
+               (int(self._pos[0] + half_width) + 1, int(self._pos[1] + half_height) + 1)
 
     def draw(self, image: np.ndarray):
         d = sqrt(self._size[1] ** 2 + self._size[0] ** 2) / 2.0
@@ -27,4 +38,33 @@ class Rect(Widget):
             (int(self._pos[0] + d * cos(beta - self.__angle)), int(self._pos[1] + d * sin(beta - self.__angle))),
             (int(self._pos[0] + d * cos(beta + self.__angle)), int(self._pos[1] - d * sin(beta + self.__angle)))
         ], np.int32)
-        cv2.fillConvexPoly(image, vertices, color=self.__background_color, lineType=cv2.LINE_AA)
+        # cv2.fillPoly is used instead of cv2.fillConvexPoly to get the same anti-aliasing as in draw_batch()
+        cv2.fillPoly(image, [vertices], color=self.__background_color, lineType=cv2.LINE_AA)
+
+    @staticmethod
+    def draw_batch(image: np.ndarray, widgets: list['Rect']):
+        # Only consecutive rects are grouped to keep the drawing order of overlapping rects
+        for color, rects in groupby(widgets, key=lambda rect: rect.__background_color):
+            rects = list(rects)
+            if len(rects) < Widget.MIN_BATCH_SIZE:
+                for rect in rects:
+                    rect.draw(image)
+                continue
+
+            pos = np.array([rect._pos for rect in rects], dtype=np.float64)
+            size = np.array([rect._size for rect in rects], dtype=np.float64)
+            angle = np.array([rect.__angle for rect in rects], dtype=np.float64)
+
+            # Same vertices as in draw() but computed for all rects at once
+            d = np.hypot(size[:, 0], size[:, 1]) / 2.0
+            beta = np.arctan2(size[:, 1], size[:, 0])
+            cos_minus, sin_minus = d * np.cos(beta - angle), d * np.sin(beta - angle)
+            cos_plus, sin_plus = d * np.cos(beta + angle), d * np.sin(beta + angle)
+            x, y = pos[:, 0], pos[:, 1]
+            vertices = np.stack([
+                np.stack([x - cos_minus, y - sin_minus], axis=1),
+                np.stack([x - cos_plus, y + sin_plus], axis=1),
+                np.stack([x + cos_minus, y + sin_minus], axis=1),
+                np.stack([x + cos_plus, y - sin_plus], axis=1)
+            ], axis=1).astype(np.int32)
+            fill_convex_polygons(image, vertices, color)
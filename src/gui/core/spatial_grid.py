@@ -0,0 +1,66 @@
+from typing import Optional
+from src.gui.core.widget import AABB, Widget
+
+Cells = tuple[int, int, int, int]
+
+
+class SpatialGrid:
+    """
+    Uniform grid of widgets keyed by their bounding boxes. It allows finding widgets under a given point without
+    testing every widget.
+    """
+
+    def __init__(self, cell_size=64):
+        self.__cell_size = cell_size
+        self.__cells: dict[tuple[int, int], dict[Widget, None]] = {}
+        self.__widget_cells: dict[Widget, Cells] = {}
+
+    def __aabb_cells(self, aabb: AABB) -> Cells:
+        (left, top), (right, bottom) = aabb
+        return left // self.__cell_size, top // self.__cell_size, right // self.__cell_size, bottom // self.__cell_size
+
+    def __contains__(self, widget: Widget):
+        return widget in self.__widget_cells
+
+    def insert(self, widget: Widget):
+        """
+        Adds the widget or updates its position in the grid if it is already there
+        """
+        cells = self.__aabb_cells(widget.aabb())
+        previous_cells = self.__widget_cells.get(widget)
+        if previous_cells == cells:
+            return
+        if previous_cells is not None:
+            self.__remove_from_cells(widget, previous_cells)
+
+        self.__widget_cells[widget] = cells
+        left, top, right, bottom = cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                self.__cells.setdefault((x, y), {})[widget] = None
+
+    def remove(self, widget: Widget):
+        cells = self.__widget_cells.pop(widget, None)
+        if cells is not None:
+            self.__remove_from_cells(widget, cells)
+
+    def clear(self):
+        self.__cells.clear()
+        self.__widget_cells.clear()
+
+    def __remove_from_cells(self, widget: Widget, cells: Cells):
+        left, top, right, bottom = cells
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell: Optional[dict[Widget, None]] = self.__cells.get((x, y))
+                if cell is None:
+                    continue
+                cell.pop(widget, None)
+                if len(cell) == 0:
+                    del self.__cells[(x, y)]
+
+    def query(self, x: int, y: int) -> list[Widget]:
+        """
+        Returns: widgets whose grid cells contain the point (the point still has to be tested against each of them)
+        """
+        return list(self.__cells.get((x // self.__cell_size, y // self.__cell_size), ()))
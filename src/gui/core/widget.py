@@ -1,19 +1,91 @@
+import cv2
 import numpy as np
 from abc import abstractmethod
-from typing import Optional
+from typing import Callable, Optional
+
+_MAX_POLYGONS_CHUNK_SIZE = 256
+
+# Axis aligned bounding box given as ((left, top), (right, bottom)) in pixels
+AABB = tuple[tuple[int, int], tuple[int, int]]
 
 
 class Widget:
+    # Smaller batches are drawn widget by widget since preparing the batch costs more than it saves
+    MIN_BATCH_SIZE = 8
+
     def __init__(self, pos: tuple[int, int], size: Optional[tuple[int, int]] = None):
         self._pos = pos
         self._size = size
+        self._on_change: Optional[Callable[['Widget'], None]] = None
 
     def set_pos(self, pos: tuple[int, int]):
-        self._pos = pos
+        if pos != self._pos:
+            self._pos = pos
+            self._changed()
 
     def set_size(self, size: tuple[int, int]):
-        self._size = size
+        if size != self._size:
+            self._size = size
+            self._changed()
+
+    def set_change_listener(self, listener: Optional[Callable[['Widget'], None]]):
+        self._on_change = listener
+
+    def _changed(self):
+        """
+        Should be called whenever a change affects the way widget is drawn
+        """
+        if self._on_change is not None:
+            self._on_change(self)
+
+    @abstractmethod
+    def aabb(self) -> AABB:
+        """
+        Returns: bounding box of the area covered by the widget when drawn
+        """
+        pass
 
     @abstractmethod
     def draw(self, image: np.ndarray):
         pass
+
+    @staticmethod
+    def draw_batch(image: np.ndarray, widgets: list['Widget']):
+        """
+        Draws widgets of the same type at once. Subclasses override it to reduce the number of OpenCV calls.
+        """
+        for widget in widgets:
+            widget.draw(image)
+
+
+def fill_convex_polygons(image: np.ndarray, polygons: np.ndarray, color: tuple[int, int, int]):
+    """
+    Fills many convex polygons of the same color with as few OpenCV calls as possible
+
+    Args:
+        image: target image
+        polygons: array of shape (polygons count, vertices count, 2)
+        color: fill color
+    """
+    # Overlaps are tested for every pair of polygons, so huge batches are split into smaller chunks
+    for start in range(0, len(polygons), _MAX_POLYGONS_CHUNK_SIZE):
+        _fill_separate_polygons(image, polygons[start:start + _MAX_POLYGONS_CHUNK_SIZE], color)
+
+
+def _fill_separate_polygons(image: np.ndarray, polygons: np.ndarray, color: tuple[int, int, int]):
+    # cv2.fillPoly uses the even-odd rule, so polygons overlapping each other (including anti-aliased edges) are
+    # filled separately
+    lefts_tops = polygons.min(axis=1) - 1
+    rights_bottoms = polygons.max(axis=1) + 1
+    overlaps = (lefts_tops[:, np.newaxis, 0] <= rights_bottoms[np.newaxis, :, 0]) & \
+               (lefts_tops[np.newaxis, :, 0] <= rights_bottoms[:, np.newaxis, 0]) & \
+               (lefts_tops[:, np.newaxis, 1] <= rights_bottoms[np.newaxis, :, 1]) & \
+               (lefts_tops[np.newaxis, :, 1] <= rights_bottoms[:, np.newaxis, 1])
+    np.fill_diagonal(overlaps, False)
+    overlapping = overlaps.any(axis=1)
+
+    if not overlapping.all():
+        cv2.fillPoly(image, list(polygons[~overlapping]), color, cv2.LINE_AA)
+    # cv2.fillConvexPoly anti-aliases edges slightly differently, so cv2.fillPoly is used for single polygons too
+    for polygon in polygons[overlapping]:
+        cv2.fillPoly(image, [polygon], color, cv2.LINE_AA)
@@ -0,0 +1,323 @@
+import threading
+import time
+
+from abc import abstractmethod
+from collections import deque
+from typing import Callable, Optional, Union
+from src.common.common_utils import simulate_hardware
+
+
+class PWMChannel:
+    @abstractmethod
+    def start(self, duty_cycle: float):
+        pass
+
+    @abstractmethod
+    def ChangeDutyCycle(self, duty_cycle: float):
+        pass
+
+    @abstractmethod
+    def ChangeFrequency(self, frequency: float):
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
+
+
+class GPIOBackend:
+    """
+    GPIO interface following RPi.GPIO naming, so drivers written for RPi.GPIO can use any backend
+    """
+    LOW = 0
+    HIGH = 1
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    @abstractmethod
+    def setmode(self, mode: int):
+        pass
+
+    @abstractmethod
+    def setwarnings(self, enabled: bool):
+        pass
+
+    @abstractmethod
+    def setup(self, pin: int, direction: int, pull_up_down: Optional[int] = None):
+        pass
+
+    @abstractmethod
+    def output(self, pin: int, value: Union[int, bool]):
+        pass
+
+    @abstractmethod
+    def input(self, pin: int) -> int:
+        pass
+
+    @abstractmethod
+    def add_event_detect(self, pin: int, edge: int, callback: Optional[Callable[[int], any]] = None):
+        pass
+
+    @abstractmethod
+    def remove_event_detect(self, pin: int):
+        pass
+
+    @abstractmethod
+    def PWM(self, pin: int, frequency: float) -> PWMChannel:
+        pass
+
+    @abstractmethod
+    def cleanup(self, pins: Optional[Union[int, list[int]]] = None):
+        pass
+
+
+class RPiGPIOBackend(GPIOBackend):
+    """Raspberry Pi GPIO through RPi.GPIO library"""
+
+    def __init__(self):
+        # noinspection PyUnresolvedReferences
+        import RPi.GPIO
+        self.__gpio = RPi.GPIO
+
+        self.LOW = RPi.GPIO.LOW
+        self.HIGH = RPi.GPIO.HIGH
+        self.BCM = RPi.GPIO.BCM
+        self.BOARD = RPi.GPIO.BOARD
+        self.OUT = RPi.GPIO.OUT
+        self.IN = RPi.GPIO.IN
+        self.PUD_OFF = RPi.GPIO.PUD_OFF
+        self.PUD_DOWN = RPi.GPIO.PUD_DOWN
+        self.PUD_UP = RPi.GPIO.PUD_UP
+        self.RISING = RPi.GPIO.RISING
+        self.FALLING = RPi.GPIO.FALLING
+        self.BOTH = RPi.GPIO.BOTH
+
+    def setmode(self, mode: int):
+        self.__gpio.setmode(mode)
+
+    def setwarnings(self, enabled: bool):
+        self.__gpio.setwarnings(enabled)
+
+    def setup(self, pin: int, direction: int, pull_up_down: Optional[int] = None):
+        if pull_up_down is None:
+            self.__gpio.setup(pin, direction)
+        else:
+            self.__gpio.setup(pin, direction, pull_up_down=pull_up_down)
+
+    def output(self, pin: int, value: Union[int, bool]):
+        self.__gpio.output(pin, value)
+
+    def input(self, pin: int) -> int:
+        return self.__gpio.input(pin)
+
+    def add_event_detect(self, pin: int, edge: int, callback: Optional[Callable[[int], any]] = None):
+        self.__gpio.add_event_detect(pin, edge, callback=callback)
+
+    def remove_event_detect(self, pin: int):
+        self.__gpio.remove_event_detect(pin)
+
+    def PWM(self, pin: int, frequency: float) -> PWMChannel:
+        return self.__gpio.PWM(pin, frequency)
+
+    def cleanup(self, pins: Optional[Union[int, list[int]]] = None):
+        if pins is None:
+            self.__gpio.cleanup()
+        else:
+            self.__gpio.cleanup(pins)
+
+
+class SimulatedGPIOBackend(GPIOBackend):
+    """
+    In-memory GPIO for running and profiling hardware code without a Raspberry Pi.
+    It keeps pin directions, levels and PWM duty cycles, records every level change with a timestamp and can
+    respond to ultrasonic sensor triggers with echo pulses of a simulated distance.
+    """
+
+    class __PWMChannel(PWMChannel):
+        def __init__(self, backend: 'SimulatedGPIOBackend', pin: int, frequency: float):
+            self.__backend = backend
+            self.pin = pin
+            self.frequency = frequency
+            self.duty_cycle = 0.
+            self.running = False
+
+        def start(self, duty_cycle: float):
+            self.running = True
+            self.ChangeDutyCycle(duty_cycle)
+
+        def ChangeDutyCycle(self, duty_cycle: float):
+            if not 0 <= duty_cycle <= 100:
+                raise ValueError("Duty cycle must be between 0 and 100")
+            self.duty_cycle = duty_cycle
+            self.__backend.record_event(self.pin, 'pwm', duty_cycle)
+
+        def ChangeFrequency(self, frequency: float):
+            self.frequency = frequency
+
+        def stop(self):
+            self.running = False
+            self.__backend.record_event(self.pin, 'pwm', 0.)
+
+    def __init__(self, events_limit=10000):
+        """
+        Args:
+            events_limit: maximum number of the latest recorded events
+        """
+        self.__lock = threading.RLock()
+        self.__mode: Optional[int] = None
+        self.__directions: dict[int, int] = {}
+        self.__levels: dict[int, int] = {}
+        self.__callbacks: dict[int, tuple[int, Optional[Callable[[int], any]]]] = {}
+        self.__pwm_channels: dict[int, SimulatedGPIOBackend.__PWMChannel] = {}
+        self.__echo_responders: dict[int, tuple[int, Callable[[], Optional[float]]]] = {}
+
+        self.__events: deque[tuple[int, int, str, float]] = deque(maxlen=events_limit)
+        self.__writes_count: dict[int, int] = {}
+
+    def record_event(self, pin: int, kind: str, value: float):
+        """Records an event of the pin as (time.perf_counter_ns(), pin, kind, value)"""
+        with self.__lock:
+            self.__events.append((time.perf_counter_ns(), pin, kind, value))
+
+    def get_events(self) -> list[tuple[int, int, str, float]]:
+        with self.__lock:
+            return list(self.__events)
+
+    def get_writes_count(self, pin: int) -> int:
+        with self.__lock:
+            return self.__writes_count.get(pin, 0)
+
+    def get_level(self, pin: int) -> int:
+        with self.__lock:
+            return self.__levels.get(pin, self.LOW)
+
+    def get_pwm_duty_cycle(self, pin: int) -> float:
+        with self.__lock:
+            channel = self.__pwm_channels.get(pin)
+            return channel.duty_cycle if channel is not None and channel.running else 0.
+
+    def set_input_level(self, pin: int, value: Union[int, bool]):
+        """
+        Changes level of an input pin as if it was driven externally (edge callbacks are called)
+        """
+        value = self.HIGH if value else self.LOW
+        with self.__lock:
+            previous = self.__levels.get(pin, self.LOW)
+            self.__levels[pin] = value
+            if previous == value:
+                return
+            self.__events.append((time.perf_counter_ns(), pin, 'input', value))
+            edge, callback = self.__callbacks.get(pin, (None, None))
+
+        if callback is not None and (edge == self.BOTH or (edge == self.RISING) == (value == self.HIGH)):
+            callback(pin)
+
+    def set_echo_responder(self, trig: int, echo: int, get_distance: Callable[[], Optional[float]]):
+        """
+        Simulates an ultrasonic sensor responding to the trigger pulse with an echo pulse
+
+        Args:
+            trig: trigger pin
+            echo: echo pin
+            get_distance: function returning the simulated distance in cm (None means no echo)
+        """
+        with self.__lock:
+            self.__echo_responders[trig] = (echo, get_distance)
+
+    def __respond_with_echo(self, echo: int, distance: Optional[float]):
+        if distance is None:
+            return
+        # The sensor sends the burst before raising the echo pin
+        time.sleep(0.0004)
+        self.set_input_level(echo, self.HIGH)
+        time.sleep(distance / 17150)
+        self.set_input_level(echo, self.LOW)
+
+    def setmode(self, mode: int):
+        self.__mode = mode
+
+    def setwarnings(self, enabled: bool):
+        pass
+
+    def setup(self, pin: int, direction: int, pull_up_down: Optional[int] = None):
+        with self.__lock:
+            self.__directions[pin] = direction
+            self.__levels[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.__levels.get(pin, self.LOW)
+
+    def output(self, pin: int, value: Union[int, bool]):
+        value = self.HIGH if value else self.LOW
+        with self.__lock:
+            if self.__directions.get(pin) != self.OUT:
+                raise RuntimeError(f"The GPIO channel {pin} has not been set up as an OUTPUT")
+            previous = self.__levels.get(pin, self.LOW)
+            self.__levels[pin] = value
+            self.__writes_count[pin] = self.__writes_count.get(pin, 0) + 1
+            self.__events.append((time.perf_counter_ns(), pin, 'output', value))
+            responder = self.__echo_responders.get(pin)
+
+        # Echo is sent after the falling edge of the trigger pulse
+        if responder is not None and previous == self.HIGH and value == self.LOW:
+            echo, get_distance = responder
+            threading.Thread(target=self.__respond_with_echo, args=(echo, get_distance()), daemon=True).start()
+
+    def input(self, pin: int) -> int:
+        with self.__lock:
+            return self.__levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin: int, edge: int, callback: Optional[Callable[[int], any]] = None):
+        with self.__lock:
+            self.__callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin: int):
+        with self.__lock:
+            self.__callbacks.pop(pin, None)
+
+    def PWM(self, pin: int, frequency: float) -> PWMChannel:
+        with self.__lock:
+            channel = SimulatedGPIOBackend.__PWMChannel(self, pin, frequency)
+            self.__pwm_channels[pin] = channel
+            return channel
+
+    def cleanup(self, pins: Optional[Union[int, list[int]]] = None):
+        with self.__lock:
+            if pins is None:
+                pins = list(self.__directions.keys())
+            elif isinstance(pins, int):
+                pins = [pins]
+            for pin in pins:
+                self.__directions.pop(pin, None)
+                self.__levels.pop(pin, None)
+                self.__callbacks.pop(pin, None)
+                channel = self.__pwm_channels.pop(pin, None)
+                if channel is not None:
+                    channel.running = False
+
+
+_gpio_backend: Optional[GPIOBackend] = None
+_gpio_backend_lock = threading.Lock()
+
+
+def get_gpio() -> GPIOBackend:
+    """
+    Returns the shared GPIO backend: simulated one with simulate-hardware argument or when RPi.GPIO is not available
+    """
+    global _gpio_backend
+    with _gpio_backend_lock:
+        if _gpio_backend is None:
+            if simulate_hardware():
+                _gpio_backend = SimulatedGPIOBackend()
+            else:
+                try:
+                    _gpio_backend = RPiGPIOBackend()
+                except (ImportError, RuntimeError) as e:
+                    print(f"GPIO is not available ({e}), using simulated GPIO")
+                    _gpio_backend = SimulatedGPIOBackend()
+        return _gpio_backend
@@ -0,0 +1,151 @@
+import threading
+import time
+
+from abc import abstractmethod
+from collections import deque
+from typing import Optional
+from src.common.common_utils import simulate_hardware
+
+
+class SPIBackend:
+    """
+    SPI interface following spidev.SpiDev naming
+    """
+    max_speed_hz = 500000
+    mode = 0
+
+    @abstractmethod
+    def open(self, bus: int, device: int):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    @abstractmethod
+    def writebytes(self, data: list[int]):
+        pass
+
+    @abstractmethod
+    def writebytes2(self, data):
+        """Writes data of any length (eg. bytes, list or numpy array)"""
+        pass
+
+
+class SpidevSPIBackend(SPIBackend):
+    def __init__(self):
+        # noinspection PyUnresolvedReferences
+        import spidev
+        self.__spi = spidev.SpiDev()
+
+    @property
+    def max_speed_hz(self):
+        return self.__spi.max_speed_hz
+
+    @max_speed_hz.setter
+    def max_speed_hz(self, value: int):
+        self.__spi.max_speed_hz = value
+
+    @property
+    def mode(self):
+        return self.__spi.mode
+
+    @mode.setter
+    def mode(self, value: int):
+        self.__spi.mode = value
+
+    def open(self, bus: int, device: int):
+        self.__spi.open(bus, device)
+
+    def close(self):
+        self.__spi.close()
+
+    def writebytes(self, data: list[int]):
+        self.__spi.writebytes(data)
+
+    def writebytes2(self, data):
+        self.__spi.writebytes2(data)
+
+
+class SimulatedSPIBackend(SPIBackend):
+    """
+    SPI device that only counts written bytes and records transfers with timestamps.
+    Transfers optionally take as long as they would at the configured clock speed.
+    """
+
+    def __init__(self, simulate_transfer_time=False, transfers_limit=10000):
+        """
+        Args:
+            simulate_transfer_time: sleep for the time the transfer would take on the bus
+            transfers_limit: maximum number of the latest recorded transfers
+        """
+        self.max_speed_hz = 500000
+        self.mode = 0
+        self.__simulate_transfer_time = simulate_transfer_time
+        self.__lock = threading.Lock()
+        self.__opened_device: Optional[tuple[int, int]] = None
+        self.__bytes_written = 0
+        self.__transfers_count = 0
+        self.__transfers: deque[tuple[int, int]] = deque(maxlen=transfers_limit)
+
+    @property
+    def bytes_written(self):
+        return self.__bytes_written
+
+    @property
+    def transfers_count(self):
+        return self.__transfers_count
+
+    def get_transfers(self) -> list[tuple[int, int]]:
+        """
+        Returns: recorded transfers as (time.perf_counter_ns(), bytes count)
+        """
+        with self.__lock:
+            return list(self.__transfers)
+
+    def open(self, bus: int, device: int):
+        self.__opened_device = (bus, device)
+
+    def close(self):
+        self.__opened_device = None
+
+    def __write(self, length: int):
+        if self.__opened_device is None:
+            raise RuntimeError("SPI device is not opened")
+        with self.__lock:
+            self.__bytes_written += length
+            self.__transfers_count += 1
+            self.__transfers.append((time.perf_counter_ns(), length))
+        if self.__simulate_transfer_time and self.max_speed_hz > 0:
+            time.sleep(length * 8 / self.max_speed_hz)
+
+    def writebytes(self, data: list[int]):
+        # spidev limits a single writebytes call to 4096 bytes
+        if len(data) > 4096:
+            raise OverflowError("Argument list size exceeds 4096 bytes")
+        self.__write(len(data))
+
+    def writebytes2(self, data):
+        self.__write(len(data))
+
+
+_spi_backend: Optional[SPIBackend] = None
+_spi_backend_lock = threading.Lock()
+
+
+def get_spi() -> SPIBackend:
+    """
+    Returns the shared SPI backend: simulated one with simulate-hardware argument or when spidev is not available
+    """
+    global _spi_backend
+    with _spi_backend_lock:
+        if _spi_backend is None:
+            if simulate_hardware():
+                _spi_backend = SimulatedSPIBackend()
+            else:
+                try:
+                    _spi_backend = SpidevSPIBackend()
+                except ImportError as e:
+                    print(f"SPI is not available ({e}), using simulated SPI")
+                    _spi_backend = SimulatedSPIBackend()
+        return _spi_backend
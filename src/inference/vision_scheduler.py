@@ -0,0 +1,197 @@
+import os
+import time
+import numpy as np
+
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+from typing import Callable, Optional, NamedTuple
+
+
+class ModelStatistics(NamedTuple):
+    """Inference statistics of a single model registered in VisionScheduler."""
+    completed: int
+    dropped: int
+    failed: int
+    throughput_fps: float
+    latency_mean_ms: float
+    """Time from the request submission to its completion"""
+    latency_p95_ms: float
+    inference_mean_ms: float
+    """Time of running the request only"""
+
+
+class VisionScheduler:
+    """
+    Runs inference requests of multiple models on a shared pool of worker threads.
+    Each model gets a CPU thread budget (used by the model's own interpreter), a priority, a maximum number of
+    concurrently running requests and an optional target rate. When a worker is free, the oldest request of the
+    highest priority model that is allowed to run is started.
+    """
+
+    class __Model:
+        def __init__(self, priority: int, threads: int, target_fps: float, max_concurrency: int, max_queue: int):
+            self.priority = priority
+            self.threads = threads
+            self.min_interval = 1. / target_fps if target_fps > 0 else 0.
+            self.max_concurrency = max_concurrency
+            self.max_queue = max_queue
+
+            self.queue: deque[tuple[Future, Callable[[], any], float]] = deque()
+            self.running = 0
+            self.last_start_time = 0.
+
+            self.completed = 0
+            self.dropped = 0
+            self.failed = 0
+            self.completion_times: deque[float] = deque(maxlen=100)
+            self.latencies: deque[float] = deque(maxlen=100)
+            self.inference_times: deque[float] = deque(maxlen=100)
+
+        def next_start_time(self):
+            return self.last_start_time + self.min_interval
+
+    def __init__(self, workers=2, total_threads: Optional[int] = None):
+        """
+        Args:
+            workers: number of requests running at the same time (across all models)
+            total_threads: number of CPU threads shared by the models (defaults to the number of CPU cores)
+        """
+        self.__total_threads = total_threads or os.cpu_count() or 1
+        self.__models: dict[str, VisionScheduler.__Model] = {}
+        self.__condition = Condition()
+        self.__running = True
+
+        self.__workers = [Thread(target=self.__worker_loop, daemon=True) for _ in range(workers)]
+        for worker in self.__workers:
+            worker.start()
+
+    def close(self):
+        with self.__condition:
+            self.__running = False
+            for model in self.__models.values():
+                while len(model.queue) > 0:
+                    model.queue.popleft()[0].cancel()
+            self.__condition.notify_all()
+        for worker in self.__workers:
+            worker.join()
+        self.__workers = []
+
+    def register(self, name: str, priority=0, threads=1, target_fps=0., max_concurrency=1, max_queue=4):
+        """
+        Args:
+            name: model name used when submitting requests
+            priority: requests of models with higher priority are started first
+            threads: number of CPU threads the model's interpreter should use (see get_threads)
+            target_fps: maximum rate of starting the model's requests (0 means no limit)
+            max_concurrency: maximum number of the model's requests running at the same time
+            max_queue: maximum number of the model's waiting requests; the oldest ones are dropped (cancelled)
+        """
+        with self.__condition:
+            self.__models[name] = VisionScheduler.__Model(priority, threads, target_fps, max_concurrency, max_queue)
+            threads_sum = sum(model.threads * model.max_concurrency for model in self.__models.values())
+        if threads_sum > self.__total_threads:
+            print(f"Thread budgets of vision models ({threads_sum}) exceed available threads ({self.__total_threads})")
+
+    def get_threads(self, name: str) -> int:
+        """Returns the thread budget of the model"""
+        return self.__models[name].threads
+
+    def submit(self, name: str, function: Callable[..., any], *args) -> Future:
+        """
+        Queues an inference request of the registered model
+
+        Returns: future of the function result
+        """
+        future = Future()
+        with self.__condition:
+            model = self.__models[name]
+            model.queue.append((future, lambda: function(*args), time.time()))
+            while len(model.queue) > model.max_queue:
+                model.queue.popleft()[0].cancel()
+                model.dropped += 1
+            self.__condition.notify()
+        return future
+
+    def get_statistics(self) -> dict[str, ModelStatistics]:
+        with self.__condition:
+            statistics: dict[str, ModelStatistics] = {}
+            for name, model in self.__models.items():
+                completion_times = model.completion_times
+                throughput = (len(completion_times) - 1) / (completion_times[-1] - completion_times[0]) \
+                    if len(completion_times) > 1 and completion_times[-1] > completion_times[0] else 0.
+                statistics[name] = ModelStatistics(
+                    completed=model.completed,
+                    dropped=model.dropped,
+                    failed=model.failed,
+                    throughput_fps=throughput,
+                    latency_mean_ms=float(np.mean(model.latencies)) * 1000 if len(model.latencies) > 0 else 0.,
+                    latency_p95_ms=float(np.percentile(model.latencies, 95)) * 1000 if len(model.latencies) > 0
+                    else 0.,
+                    inference_mean_ms=float(np.mean(model.inference_times)) * 1000
+                    if len(model.inference_times) > 0 else 0.
+                )
+            return statistics
+
+    def __next_request(self):
+        """
+        Returns: the model and request that should be started now or time in seconds until a rate limited request
+                 can be started (None if there is nothing to wait for)
+        """
+        now = time.time()
+        wait_time: Optional[float] = None
+        for model in sorted(self.__models.values(), key=lambda m: m.priority, reverse=True):
+            if len(model.queue) == 0 or model.running >= model.max_concurrency:
+                continue
+            if now < model.next_start_time():
+                wait_time = min(wait_time or float('inf'), model.next_start_time() - now)
+                continue
+            return model, model.queue.popleft()
+        return wait_time
+
+    def __worker_loop(self):
+        while True:
+            with self.__condition:
+                while True:
+                    if not self.__running:
+                        return
+                    next_request = self.__next_request()
+                    if isinstance(next_request, tuple):
+                        break
+                    self.__condition.wait(next_request)
+
+                model, (future, request, submit_time) = next_request
+                model.running += 1
+                model.last_start_time = time.time()
+
+            if not future.set_running_or_notify_cancel():
+                with self.__condition:
+                    model.running -= 1
+                    self.__condition.notify()
+                continue
+
+            start = time.time()
+            # noinspection PyBroadException
+            try:
+                result = request()
+                exception = None
+            except Exception as e:
+                result = None
+                exception = e
+            end = time.time()
+
+            with self.__condition:
+                model.running -= 1
+                if exception is None:
+                    model.completed += 1
+                    model.completion_times.append(end)
+                    model.latencies.append(end - submit_time)
+                    model.inference_times.append(end - start)
+                else:
+                    model.failed += 1
+                self.__condition.notify()
+
+            if exception is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
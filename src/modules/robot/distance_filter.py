@@ -0,0 +1,78 @@
+from bisect import bisect_left, insort
+from typing import Optional
+
+
+class DistanceFilterConfig:
+    def __init__(self, window_size=3, ema_alpha=0.7, max_rate=1000.):
+        """
+        Args:
+            window_size: number of the latest samples the median is calculated from (single spikes are rejected when
+                         it is at least 3)
+            ema_alpha: weight of the new median value in the exponential moving average of increasing distances
+                       (1 disables smoothing)
+            max_rate: maximum increase of the filtered distance in cm per second (0 disables the limit)
+        """
+        self.window_size = window_size
+        self.ema_alpha = ema_alpha
+        self.max_rate = max_rate
+
+
+class DistanceFilter:
+    """
+    Streaming filter of a single sensor: running median over a fixed size ring buffer rejects single outliers.
+    Decreasing distances (an approaching obstacle) are passed through immediately, so obstacle reactions are not
+    delayed, while increasing distances are rate limited and smoothed with an exponential moving average.
+    Each sample is processed in constant time for a given window size.
+    """
+
+    def __init__(self, config: Optional[DistanceFilterConfig] = None):
+        self.__config = config or DistanceFilterConfig()
+        self.__window: list[float] = [0.] * max(1, self.__config.window_size)
+        self.__sorted_window: list[float] = []
+        self.__index = 0
+        self.__value: Optional[float] = None
+        self.__last_timestamp = 0.
+
+    @property
+    def config(self):
+        return self.__config
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.__value
+
+    def reset(self):
+        self.__sorted_window = []
+        self.__index = 0
+        self.__value = None
+
+    def update(self, sample: float, timestamp: float) -> float:
+        """
+        Args:
+            sample: raw distance
+            timestamp: time of the sample in seconds
+
+        Returns: filtered distance
+        """
+        window_size = len(self.__window)
+        if len(self.__sorted_window) == window_size:
+            oldest = self.__window[self.__index]
+            del self.__sorted_window[bisect_left(self.__sorted_window, oldest)]
+        self.__window[self.__index] = sample
+        self.__index = (self.__index + 1) % window_size
+        insort(self.__sorted_window, sample)
+
+        count = len(self.__sorted_window)
+        median = self.__sorted_window[count // 2] if count % 2 == 1 else \
+            (self.__sorted_window[count // 2 - 1] + self.__sorted_window[count // 2]) / 2
+
+        if self.__value is None or median <= self.__value:
+            self.__value = median
+        else:
+            if self.__config.max_rate > 0:
+                max_change = self.__config.max_rate * max(0., timestamp - self.__last_timestamp)
+                median = min(median, self.__value + max_change)
+            self.__value += self.__config.ema_alpha * (median - self.__value)
+        self.__last_timestamp = timestamp
+
+        return self.__value
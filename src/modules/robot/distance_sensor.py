@@ -1,35 +1,201 @@
 import time
+import numpy as np
 
-import RPi.GPIO as GPIO
+from threading import Lock, Thread
+from typing import Optional
+from src.hal.gpio import GPIOBackend, get_gpio
+from src.modules.robot.distance_filter import DistanceFilter
 
 
 class DistanceSensor:
+    """
+    HC-SR04 ultrasonic sensor. Echo pulse is timed with GPIO edge callbacks, so no thread waits for the echo.
+    """
     RANGE_CM = 200
+    # Speed of sound in cm per nanosecond divided by 2 (sound travels to the obstacle and back)
+    __CM_PER_NS = 34300 / 2 / 1e9
+    # Maximum echo duration for the sensor range
+    ECHO_TIMEOUT_NS = int(RANGE_CM / __CM_PER_NS)
 
-    def __init__(self, trig: int, echo: int):
+    def __init__(self, trig: int, echo: int, gpio: Optional[GPIOBackend] = None):
+        """
+        Args:
+            trig: trigger pin (BCM numbering)
+            echo: echo pin (BCM numbering)
+            gpio: GPIO backend (shared backend by default)
+        """
         self.__TRIG = trig
         self.__ECHO = echo
+        self.__gpio = gpio or get_gpio()
+
+        self.__lock = Lock()
+        self.__trigger_time_ns = 0
+        self.__pulse_start_ns: Optional[int] = None
+        self.__waiting_for_echo = False
+        self.__last_distance = float(DistanceSensor.RANGE_CM)
+        self.__last_measurement_time_ns = 0
+
+        self.__gpio.setmode(self.__gpio.BCM)
+        self.__gpio.setwarnings(False)
+
+        self.__gpio.setup(self.__TRIG, self.__gpio.OUT)
+        self.__gpio.setup(self.__ECHO, self.__gpio.IN)
+        self.__gpio.output(self.__TRIG, False)
+        self.__gpio.add_event_detect(self.__ECHO, self.__gpio.BOTH, callback=self.__handle_echo_edge)
+
+    @property
+    def trig(self):
+        return self.__TRIG
+
+    @property
+    def echo(self):
+        return self.__ECHO
+
+    def close(self):
+        self.__gpio.remove_event_detect(self.__ECHO)
+
+    def trigger(self):
+        """Sends the ultrasonic burst; the distance is updated when the echo arrives"""
+        with self.__lock:
+            self.__pulse_start_ns = None
+            self.__waiting_for_echo = True
+            self.__trigger_time_ns = time.perf_counter_ns()
+        self.__gpio.output(self.__TRIG, True)
+        time.sleep(0.00001)
+        self.__gpio.output(self.__TRIG, False)
 
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setwarnings(False)
+    def check_timeout(self) -> bool:
+        """
+        Marks the measurement as out of range if the echo has not ended within the sensor range
 
-        GPIO.setup(self.__TRIG, GPIO.OUT)
-        GPIO.setup(self.__ECHO, GPIO.IN)
-        GPIO.output(self.__TRIG, False)
+        Returns: True if the measurement has timed out
+        """
+        with self.__lock:
+            if not self.__waiting_for_echo:
+                return False
+            now = time.perf_counter_ns()
+            start = self.__pulse_start_ns if self.__pulse_start_ns is not None else self.__trigger_time_ns
+            if now - start <= DistanceSensor.ECHO_TIMEOUT_NS:
+                return False
+            self.__waiting_for_echo = False
+            self.__last_distance = float(DistanceSensor.RANGE_CM)
+            self.__last_measurement_time_ns = now
+            return True
+
+    def __handle_echo_edge(self, _channel: int):
+        now = time.perf_counter_ns()
+        # Edge direction is read from the pin level, so a dropped or merged edge cannot swap the pulse start and end
+        level = self.__gpio.input(self.__ECHO)
+        with self.__lock:
+            if not self.__waiting_for_echo:
+                return
+            # Rising edge starts the echo pulse and falling edge ends it
+            if level == self.__gpio.HIGH:
+                self.__pulse_start_ns = now
+                return
+            if self.__pulse_start_ns is None:
+                return
+            self.__waiting_for_echo = False
+            self.__last_distance = min((now - self.__pulse_start_ns) * DistanceSensor.__CM_PER_NS,
+                                       float(DistanceSensor.RANGE_CM))
+            self.__last_measurement_time_ns = now
 
     def get_distance(self):
         """
-        Returns: distance in cm
+        Returns: distance in cm measured by the latest completed measurement (RANGE_CM if it was out of range)
         """
-        GPIO.output(self.__TRIG, True)
-        time.sleep(0.00001)
-        GPIO.output(self.__TRIG, False)
-
-        pulse_start: float = 0
-        pulse_end: float = 0
-        while GPIO.input(self.__ECHO) == 0:
-            pulse_start = time.time()
-        while GPIO.input(self.__ECHO) == 1:
-            pulse_end = time.time()
-        pulse_duration = pulse_end - pulse_start
-        return pulse_duration * 17150
+        return self.__last_distance
+
+    @property
+    def last_measurement_time_ns(self):
+        return self.__last_measurement_time_ns
+
+
+class DistanceSensors:
+    """
+    Measures distances with multiple sensors in a background thread.
+    Sensors are triggered one after another, so echo of one sensor is not received by another one.
+    Latest distances are filtered and published in a shared array.
+    """
+
+    def __init__(self, sensors: list[DistanceSensor], slot_duration=0.025,
+                 filters: Optional[list[DistanceFilter]] = None):
+        """
+        Args:
+            sensors: sensors in the order of the published distances
+            slot_duration: time in seconds reserved for a single measurement (should be longer than the echo timeout
+                           so echoes can fade before triggering the next sensor)
+            filters: filter of each sensor (by default each sensor gets a filter with the default configuration)
+        """
+        self.__sensors = sensors
+        self.__slot_duration = max(slot_duration, DistanceSensor.ECHO_TIMEOUT_NS / 1e9)
+        self.__filters = filters or [DistanceFilter() for _ in sensors]
+        if len(self.__filters) != len(sensors):
+            raise ValueError("Number of filters does not match number of sensors")
+        self.__raw_distances = np.full(len(sensors), float(DistanceSensor.RANGE_CM))
+        self.__distances = np.full(len(sensors), float(DistanceSensor.RANGE_CM))
+        self.__measurement_times_ns = [0] * len(sensors)
+        self.__timeouts = 0
+
+        self.__running = False
+        self.__thread: Optional[Thread] = None
+
+    @property
+    def sensors(self):
+        return self.__sensors
+
+    @property
+    def timeouts(self):
+        """Number of measurements that ended without an echo"""
+        return self.__timeouts
+
+    def start(self):
+        if self.__thread is not None:
+            return
+        self.__running = True
+        self.__thread = Thread(target=self.__measurement_loop, daemon=True)
+        self.__thread.start()
+
+    def close(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        for sensor in self.__sensors:
+            sensor.close()
+
+    def get_distances(self) -> list[float]:
+        """
+        Returns: latest filtered distances in cm in the sensors order
+        """
+        return self.__distances.tolist()
+
+    def get_raw_distances(self) -> list[float]:
+        """
+        Returns: latest measured distances in cm in the sensors order
+        """
+        return self.__raw_distances.tolist()
+
+    def __measurement_loop(self):
+        next_slot_time = time.perf_counter()
+        while self.__running:
+            for i, sensor in enumerate(self.__sensors):
+                sensor.trigger()
+
+                next_slot_time += self.__slot_duration
+                time.sleep(max(0., next_slot_time - time.perf_counter()))
+                if sensor.check_timeout():
+                    self.__timeouts += 1
+
+                # Filter is updated at the sampling rate, so reading distances does not add any work
+                measurement_time_ns = sensor.last_measurement_time_ns
+                if measurement_time_ns != self.__measurement_times_ns[i]:
+                    self.__measurement_times_ns[i] = measurement_time_ns
+                    distance = sensor.get_distance()
+                    self.__raw_distances[i] = distance
+                    self.__distances[i] = self.__filters[i].update(distance, measurement_time_ns / 1e9)
+
+                if not self.__running:
+                    return
+            # Keep the schedule after delays (eg. when the process has been suspended)
+            next_slot_time = max(next_slot_time, time.perf_counter() - self.__slot_duration)
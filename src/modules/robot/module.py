@@ -1,19 +1,32 @@
 import time
 
+from collections import deque
+from concurrent.futures import Future, wait
 from threading import Thread
 from typing import Optional
 from src.common.math_utils import clamp_f
+from src.depth_estimation.depth import DepthEstimator
+from src.depth_estimation.range_fusion import TargetRangeEstimator
 from src.config.commands import Commands
 from src.gui.core.gui import GUI
+from src.hal.gpio import SimulatedGPIOBackend, get_gpio
+from src.inference.vision_scheduler import VisionScheduler
 from src.modules.moduleBase import ModuleBase
-from src.modules.robot.distance_sensor import DistanceSensor
+from src.modules.robot.distance_sensor import DistanceSensor, DistanceSensors
 from src.modules.robot.robot_controller import RobotController
 from src.modules.robot.view import RobotView
 from src.modules.robot.wheels_controller import WheelsController
-from src.object_detection.objectDetector import ObjectDetector, Detection
+from src.object_detection.detection_cache import DetectionCache
+from src.object_detection.motion_gate import MotionGate
+from src.object_detection.objectDetector import ObjectDetector, Detection, DetectionResult, Rect, \
+    get_region_around
+from src.object_detection.tracker import ObjectTracker
 
 
 class RobotModule(ModuleBase):
+    # While a target is tracked, detection runs on a region around it and only every n-th run uses the whole frame
+    __FULL_FRAME_DETECTION_INTERVAL = 5
+    __DEPTH_ESTIMATION_FPS = 5
 
     def __init__(self, gui: GUI):
         super().__init__(gui)
@@ -28,25 +41,46 @@ class RobotModule(ModuleBase):
 
         self.__detector: Optional[ObjectDetector] = None
         self.__movement_thread: Optional[Thread] = None
-        self.__last_target_detection: Optional[dict] = None
+        self.__tracker = ObjectTracker()
+        self.__motion_gate = MotionGate()
 
         self.__wheels = WheelsController()
         self.__current_direction: Optional[RobotController.Direction] = None
         self.__next_direction: Optional[RobotController.Direction] = None
 
-        self.__sensors = [
+        self.__sensors = DistanceSensors([
             DistanceSensor(trig=16, echo=19),  # front (0 deg)
             DistanceSensor(trig=17, echo=27),  # left (45deg)
             DistanceSensor(trig=21, echo=20)  # right (-45deg)
-        ]
+        ])
+        gpio = get_gpio()
+        if isinstance(gpio, SimulatedGPIOBackend):
+            # Simulated sensors see an obstacle at a fixed distance
+            for sensor in self.__sensors.sensors:
+                gpio.set_echo_responder(sensor.trig, sensor.echo, lambda: DistanceSensor.RANGE_CM * 0.75)
+        self.__sensors.start()
 
         super().register_command(Commands.ROBOT.target_cat,  # , 'person'
                                  lambda *args: self.__start_targeting_objects('cat', 'dog', 'horse', 'sheep', 'cow',
                                                                               'bear', 'zebra', 'teddy bear', 'bottle'))
 
-        self.__detector = ObjectDetector(self._gui)
-        # self.__depth: Optional[DepthEstimator] = None
-        # self.__depth = DepthEstimator(self._gui)
+        # Detection keeps most of the CPU, depth estimation runs at a lower rate and priority
+        self.__scheduler = VisionScheduler(workers=3)
+        self.__scheduler.register(ObjectDetector.MODEL_NAME, priority=1, threads=1, max_concurrency=2)
+        self.__scheduler.register(DepthEstimator.MODEL_NAME, priority=0, threads=1,
+                                  target_fps=RobotModule.__DEPTH_ESTIMATION_FPS, max_queue=1)
+
+        self.__detector = ObjectDetector(self._gui, slots_count=2, scheduler=self.__scheduler)
+        self.__detection_cache = DetectionCache(self.__detector)
+        self.__detection_cache.subscribe(self.__handle_detection_result)
+        # Without the depth model the target distance is estimated only from the box size
+        self.__depth: Optional[DepthEstimator] = None
+        try:
+            self.__depth = DepthEstimator(self._gui, scheduler=self.__scheduler)
+        except RuntimeError as e:
+            print(f"Depth estimation is disabled: {e}")
+        self.__range_estimator = TargetRangeEstimator()
+        self.__camera_frame_size = self._gui.get_size()
 
         self.__is_targeting = False
         self.__targeting_process: Optional[Thread] = None
@@ -58,20 +92,27 @@ class RobotModule(ModuleBase):
 
     def close(self):
         self.stop_targeting()
+        self.__sensors.close()
         self.__wheels.close()
         self.__detector.close()
-        # self.__depth.close()
+        if self.__depth is not None:
+            self.__depth.close()
+        self.__scheduler.close()
         super().close()
 
     def stop_targeting(self):
         self.__view.toggle_fill_buttons(True)
         self.__view.toggle_depth_preview(False)
+        if self.__depth is not None:
+            self.__depth.stop_background()
         self._gui.stop_camera_preview()
 
         self.__is_targeting = False
         if self.__targeting_process is not None:
             self.__targeting_process.join()
             self.__targeting_process = None
+            print(f"Motion gate statistics: {self.__motion_gate.get_statistics()}")
+            print(f"Vision models statistics: {self.__scheduler.get_statistics()}")
 
         if self.__movement_thread is not None:
             self.__movement_thread.join()
@@ -130,19 +171,25 @@ class RobotModule(ModuleBase):
         while self.__targeting_process is not None:
             start = time.time()
 
-            distances = [1.0 - clamp_f(sensor.get_distance() / DistanceSensor.RANGE_CM, 0, 1)
-                         for sensor in self.__sensors]
+            distances = [1.0 - clamp_f(distance / DistanceSensor.RANGE_CM, 0, 1)
+                         for distance in self.__sensors.get_distances()]
 
+            # Target position is predicted by the tracker between detections
+            tracked_objects = self.__tracker.predict(start)
+            target_box = tracked_objects[0].bounding_box if len(tracked_objects) > 0 else None
+
+            # Distance is fused from the depth map sampled inside the target box and the box size
             estimated_cat_position = {
-                'x': -self.__last_target_detection['position'][0],
-                'distance': clamp_f(1.0 - self.__last_target_detection['area'], 0, 1) * 4
-            } if self.__last_target_detection is not None else None
+                'x': -self.__normalize_target_box(target_box)['position'][0],
+                'distance': self.__range_estimator.estimate(
+                    target_box, self.__camera_frame_size, start,
+                    self.__depth.get_last_estimation() if self.__depth is not None else None)
+            } if target_box is not None else None
             if estimated_cat_position is not None:
                 print(f"Cat position: x: {estimated_cat_position['x']}; distance: {estimated_cat_position['distance']}")
             else:
                 print(f"Sensors distances: {' | '.join(map(lambda dst: '{0:03d}cm'.format(round(dst)), distances))}")
             movement = self.__robot_controller.update(distances, estimated_cat_position)
-            self.__last_target_detection = None
 
             # self.__handle_direction_change(RobotController.Direction.LEFT, True, True)
             direction = RobotController.Direction.FORWARD if movement[RobotController.Direction.FORWARD] \
@@ -157,32 +204,33 @@ class RobotModule(ModuleBase):
             elapsed_time = time.time() - start
             time.sleep(max(0.0, 1.0 / 30.0 - elapsed_time))
 
-    def __handle_target_detection(self, detections: list[Detection]):  # position: Tuple[float, float], area: float):
+    def __normalize_target_box(self, box: Rect):
+        gui_width, gui_height = self._gui.get_size()
+        center = (
+            ((box.left + box.right) / 2) / gui_width * 2.0 - 1.0,
+            ((box.top + box.bottom) / 2) / gui_height * 2.0 - 1.0
+        )
+        normalized_area = (abs(box.right - box.left) * abs(box.bottom - box.top)) / (gui_width * gui_height)
+        return {
+            'position': center,
+            'area': normalized_area
+        }
+
+    def __handle_detection_result(self, result: DetectionResult):
+        if not self.__is_targeting:
+            return
+        self.__handle_target_detection(result.detections, result.timestamp)
+
+    def __handle_target_detection(self, detections: list[Detection], timestamp: float):
         # print(f"DETECTIONS: {len(detections)}")
         self.__view.set_detections(detections)
+        self.__tracker.update(detections, timestamp)
 
         if len(detections) <= 0:
             return
 
-        best_detection = detections[0]
-
-        gui_width, gui_height = self._gui.get_size()
-        center = (
-            ((best_detection.bounding_box.left + best_detection.bounding_box.right) / 2) / gui_width * 2.0 - 1.0,
-            ((best_detection.bounding_box.top + best_detection.bounding_box.bottom) / 2) / gui_height * 2.0 - 1.0
-        )
-        normalized_area = (
-                                  abs(best_detection.bounding_box.right - best_detection.bounding_box.left) *
-                                  abs(best_detection.bounding_box.bottom - best_detection.bounding_box.top)
-                          ) / (gui_width * gui_height)
-
-        print("Target detected at position:", center, "with area:", normalized_area)
-
-        self.__last_target_detection = {
-            'position': center,
-            'area': normalized_area,
-            # 'timestamp': datetime.now().timestamp()
-        }
+        target = self.__normalize_target_box(detections[0].bounding_box)
+        print("Target detected at position:", target['position'], "with area:", target['area'])
 
     def __targeting_thread(self, *object_names: str):
         self.__is_targeting = True
@@ -191,24 +239,56 @@ class RobotModule(ModuleBase):
 
         self._gui.start_camera_preview()
         self.__view.toggle_fill_buttons(False)
-        self.__view.toggle_depth_preview(True)
 
+        self.__detector.set_allowed_labels(object_names)
+        if self.__depth is not None:
+            self.__view.toggle_depth_preview(True)
+            self.__depth.start_background(
+                self._gui.wait_for_camera_frame, fps=RobotModule.__DEPTH_ESTIMATION_FPS,
+                on_estimation=lambda estimation: self.__view.set_depth_map(estimation.depth_map))
+
+        # Next frame is preprocessed while the previous one is still being inferred
+        pending_detections: deque[Future] = deque()
+        last_sequence_number = 0
+        self.__detection_cache.clear()
+        self.__tracker.reset()
+        self.__motion_gate.reset()
+        detections_count = 0
         while self.__is_targeting:
             # start = time.time()
 
-            image = self._gui.get_last_camera_frame()
-            if image is None:
+            # Each frame is processed only once
+            frame = self._gui.wait_for_camera_frame(last_sequence_number, timeout=0.5)
+            if frame is None:
+                continue
+            last_sequence_number = frame.sequence_number
+            self.__camera_frame_size = (frame.image.shape[1], frame.image.shape[0])
+
+            # Detector is skipped on static scenes unless a target is being tracked
+            if not self.__motion_gate.should_process(frame.image, force=self.__tracker.has_targets(frame.timestamp)):
                 continue
 
-            detections = self.__detector.detect(image)
-            self.__handle_target_detection(list(filter(lambda d: d.categories[0].label in object_names, detections)))
+            while len(pending_detections) > 0 and pending_detections[0].done():
+                pending_detections.popleft()
+            if len(pending_detections) >= self.__detector.slots_count:
+                wait((pending_detections.popleft(),))
 
-            # depth_estimation = self.__depth.estimate(image)
-            # self.__view.set_depth_estimation_image(depth_estimation)
+            region: Optional[Rect] = None
+            tracked_objects = self.__tracker.predict(frame.timestamp)
+            if len(tracked_objects) > 0 and detections_count % RobotModule.__FULL_FRAME_DETECTION_INTERVAL != 0:
+                frame_height, frame_width = frame.image.shape[:2]
+                region = get_region_around(tracked_objects[0].bounding_box, frame_width, frame_height)
+            detections_count += 1
+
+            pending_detections.append(
+                self.__detection_cache.request(frame.image, frame.sequence_number, frame.timestamp, region))
 
             # fps = min(30.0, 1 / (time.time() - start))
             # print("FPS:", fps)
 
+        for future in pending_detections:
+            future.cancel()
+
     def __start_targeting_objects(self, *object_names: str):
         if self.__targeting_process is not None:
             print("There is already a targeting objects process running")
@@ -9,6 +9,35 @@ from src.common.common_utils import data_dir
 from src.modules.workbench.neural_network.network import NeuralNetwork
 
 
+class RobotControllerConfig:
+    def __init__(self,
+                 front_sensor_obstacle_threshold=0.9,
+                 side_sensor_obstacle_threshold=0.7,
+                 obstacle_retreat_duration=1.0,
+                 obstacle_retreat_rotation_factor=0.05
+                 ):
+        """
+        Args:
+            front_sensor_obstacle_threshold: normalized front sensor value above which the robot retreats from an obstacle
+            side_sensor_obstacle_threshold: normalized side sensor value above which the robot rotates away from an obstacle while retreating
+            obstacle_retreat_duration: duration (in seconds) of moving backward after detecting an obstacle
+            obstacle_retreat_rotation_factor: part of the full circle rotation performed while retreating from an obstacle
+        """
+
+        self.front_sensor_obstacle_threshold = front_sensor_obstacle_threshold
+        self.side_sensor_obstacle_threshold = side_sensor_obstacle_threshold
+        self.obstacle_retreat_duration = obstacle_retreat_duration
+        self.obstacle_retreat_rotation_factor = obstacle_retreat_rotation_factor
+
+    def to_dict(self):
+        return {
+            "front_sensor_obstacle_threshold": self.front_sensor_obstacle_threshold,
+            "side_sensor_obstacle_threshold": self.side_sensor_obstacle_threshold,
+            "obstacle_retreat_duration": self.obstacle_retreat_duration,
+            "obstacle_retreat_rotation_factor": self.obstacle_retreat_rotation_factor
+        }
+
+
 class RobotController:
     class Direction(Enum):
         FORWARD, BACKWARD, LEFT, RIGHT = range(4)
@@ -23,13 +52,12 @@ class RobotController:
     __FULL_CIRCLE_ROTATION_DURATION = 2.6667
     VIEW_ANGLE = math.pi * 0.5  # Should match the camera view angle
     MOVEMENT_SPEED = 0.5  # Robot movement speed in meters per second
-    __FRONT_SENSOR_OBSTACLE_THRESHOLD = 0.9
-    __SIDE_SENSOR_OBSTACLE_THRESHOLD = 0.7
-    __OBSTACLE_RETREAT_DURATION = 1.0
-    __OBSTACLE_RETREAT_ROTATION_FACTOR = 0.05
 
-    def __init__(self):
-        self.__network = self.load_best_ai_player()
+    def __init__(self, config: Optional[RobotControllerConfig] = None, network: Optional[NeuralNetwork] = None,
+                 verbose=True):
+        self.__config = config or RobotControllerConfig()
+        self.__network = network or self.load_best_ai_player()
+        self.__verbose = verbose
         self.__last_update_time: Optional[float] = None
 
         # For turning
@@ -48,22 +76,29 @@ class RobotController:
 
         return NeuralNetwork.from_dict(data)
 
-    def update(self, sensors: list[float], estimated_cat_position: Optional[dict[str, float]]) -> dict[Direction, bool]:
+    @property
+    def config(self):
+        return self.__config
+
+    def update(self, sensors: list[float], estimated_cat_position: Optional[dict[str, float]],
+               delta_time: Optional[float] = None) -> dict[Direction, bool]:
         """
         Calculate the robot's current movement according to some inputs
         Args:
             sensors: list of normalized distance sensors values [front, left, right]
             estimated_cat_position: dictionary with key 'x' representing the cat's normalized x coordinate relative to camera view and key 'distance' representing estimated distance (in meters) of the cat from the robot
+            delta_time: time (in seconds) since the previous update; measured with wall clock if None
 
         Returns:
             A dictionary with RobotController.Direction as keys and boolean values
         """
 
-        now = time()
-        if self.__last_update_time is None:
+        if delta_time is None:
+            now = time()
+            if self.__last_update_time is None:
+                self.__last_update_time = now
+            delta_time = now - self.__last_update_time
             self.__last_update_time = now
-        delta_time = now - self.__last_update_time
-        self.__last_update_time = now
 
         if estimated_cat_position is not None:
             self.__rotation_procedure = RobotController.__MovementProcedure(
@@ -78,26 +113,27 @@ class RobotController:
             )
 
         # Move back a bit if front sensor is detecting near obstacle
-        if sensors[0] > RobotController.__FRONT_SENSOR_OBSTACLE_THRESHOLD:
+        if sensors[0] > self.__config.front_sensor_obstacle_threshold:
             self.__movement_procedure = RobotController.__MovementProcedure(
                 RobotController.Direction.BACKWARD,
-                RobotController.__OBSTACLE_RETREAT_DURATION
+                self.__config.obstacle_retreat_duration
             )
 
             # Rotate a bit if obstacle is detected by the left or right sensor
-            if sensors[1] > RobotController.__SIDE_SENSOR_OBSTACLE_THRESHOLD:  # Left sensor
+            if sensors[1] > self.__config.side_sensor_obstacle_threshold:  # Left sensor
                 self.__rotation_procedure = RobotController.__MovementProcedure(
                     RobotController.Direction.RIGHT,
-                    RobotController.__FULL_CIRCLE_ROTATION_DURATION * RobotController.__OBSTACLE_RETREAT_ROTATION_FACTOR
+                    RobotController.__FULL_CIRCLE_ROTATION_DURATION * self.__config.obstacle_retreat_rotation_factor
                 )
-            if sensors[2] > RobotController.__SIDE_SENSOR_OBSTACLE_THRESHOLD:  # Right sensor
+            if sensors[2] > self.__config.side_sensor_obstacle_threshold:  # Right sensor
                 self.__rotation_procedure = RobotController.__MovementProcedure(
                     RobotController.Direction.LEFT,
-                    RobotController.__FULL_CIRCLE_ROTATION_DURATION * RobotController.__OBSTACLE_RETREAT_ROTATION_FACTOR
+                    RobotController.__FULL_CIRCLE_ROTATION_DURATION * self.__config.obstacle_retreat_rotation_factor
                 )
 
         if self.__rotation_procedure is not None:
-            print(f"Rotation procedure: {self.__rotation_procedure.direction} | {self.__rotation_procedure.duration}")
+            if self.__verbose:
+                print(f"Rotation procedure: {self.__rotation_procedure.direction} | {self.__rotation_procedure.duration}")
             self.__rotation_procedure.duration -= delta_time
             if self.__rotation_procedure.duration <= 0:
                 self.__rotation_procedure = None
@@ -110,7 +146,8 @@ class RobotController:
                 }
 
         if self.__movement_procedure is not None:
-            print(f"Movement procedure: {self.__movement_procedure.direction} | {self.__movement_procedure.duration}")
+            if self.__verbose:
+                print(f"Movement procedure: {self.__movement_procedure.direction} | {self.__movement_procedure.duration}")
             self.__movement_procedure.duration -= delta_time
             if self.__movement_procedure.duration <= 0:
                 self.__movement_procedure = None
@@ -122,6 +159,14 @@ class RobotController:
                     RobotController.Direction.RIGHT: False
                 }
 
+        if self.__network is None:
+            return {
+                RobotController.Direction.FORWARD: False,
+                RobotController.Direction.BACKWARD: False,
+                RobotController.Direction.LEFT: False,
+                RobotController.Direction.RIGHT: False
+            }
+
         prediction = self.__network.calculate(sensors)
         if len(prediction) != len(self.__network.layers[-1]):
             raise ValueError("Network output size does not match number of neurons in last layer of network")
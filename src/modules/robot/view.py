@@ -1,3 +1,4 @@
+import cv2
 import numpy as np
 
 from typing import Callable, Optional
@@ -20,6 +21,7 @@ class RobotView(ViewBase):
         self.__on_turn_right = on_turn_right
         self.__gui: Optional[GUI] = None
         self.__detection_widgets: list[Widget] = []
+        self.__displayed_detections: list[Detection] = []
 
         # ↑↓↶↷
         self.__button_forward = Button(text='Forward', pos=(0, 0), font_size=1,
@@ -36,6 +38,10 @@ class RobotView(ViewBase):
                                           on_mouse_up=lambda: self.__on_turn_right(False))
 
         self.__depth_estimation_image = Image(pos=(0, GUI.DEFAULT_SIZE[1]), size=GUI.DEFAULT_SIZE)
+        # Image widget keeps a reference to the image, so the next depth preview is drawn into the other buffer
+        self.__depth_preview_buffers = [np.zeros((GUI.DEFAULT_SIZE[1], GUI.DEFAULT_SIZE[0], 3), dtype=np.uint8)
+                                        for _ in range(2)]
+        self.__depth_preview_index = 0
 
     def load(self, gui: GUI):
         self.__gui = gui
@@ -63,8 +69,6 @@ class RobotView(ViewBase):
         for button in [self.__button_forward, self.__button_backward, self.__button_turn_left,
                        self.__button_turn_right]:
             button.set_fill(fill)
-        if self.__gui is not None:
-            self.__gui.redraw()
 
     def toggle_depth_preview(self, show: bool):
         if self.__gui is None:
@@ -79,19 +83,31 @@ class RobotView(ViewBase):
     def set_depth_estimation_image(self, image: np.ndarray):
         self.__depth_estimation_image.set_image(image)
 
+    def set_depth_map(self, depth_map: np.ndarray):
+        """
+        Shows raw depth map (eg. DepthEstimator.estimate_raw output) scaled to the preview size
+        """
+        normalized = cv2.normalize(depth_map, None, 0, 255, norm_type=cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+        preview = self.__depth_preview_buffers[self.__depth_preview_index]
+        self.__depth_preview_index = (self.__depth_preview_index + 1) % len(self.__depth_preview_buffers)
+        cv2.cvtColor(cv2.resize(normalized, GUI.DEFAULT_SIZE), cv2.COLOR_GRAY2BGR, dst=preview)
+        self.__depth_estimation_image.set_image(preview)
+
     def set_steering_button_active(self, name: str, is_active: bool):
         button = self.__button_forward if name == 'forward' else self.__button_backward if name == 'backward' else self.__button_turn_left if name == 'left' else self.__button_turn_right if name == 'right' else None
         if button is not None:
             button.set_text_color((132, 199, 129) if is_active else (255, 255, 255))
-            if self.__gui is not None:
-                self.__gui.redraw()
 
     def set_detections(self, detections: list[Detection]):
         if self.__gui is None:
             return
+        # Overlay is rebuilt only when the detections change
+        if detections == self.__displayed_detections:
+            return
+        self.__displayed_detections = list(detections)
 
-        for widget in self.__detection_widgets:
-            self.__gui.remove_widgets(widget)
+        previous_detection_widgets = self.__detection_widgets
+        self.__detection_widgets = []
 
         for detection in detections:
             # Draw bounding_box
@@ -132,5 +148,4 @@ class RobotView(ViewBase):
                           align=GUIConsts.TextAlign.LEFT)
             self.__detection_widgets.append(label)
 
-            self.__gui.add_widgets((rect, center, label))
-        self.__gui.redraw()
+        self.__gui.replace_widgets(previous_detection_widgets, self.__detection_widgets)
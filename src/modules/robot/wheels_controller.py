@@ -1,5 +1,5 @@
-# noinspection PyUnresolvedReferences
-import RPi.GPIO as GPIO
+from typing import Optional
+from src.hal.gpio import GPIOBackend, get_gpio
 
 
 class WheelsController:
@@ -20,37 +20,42 @@ class WheelsController:
         FORWARD = 1
         BACKWARD = -1
 
-    def __init__(self):
+    def __init__(self, gpio: Optional[GPIOBackend] = None):
+        """
+        Args:
+            gpio: GPIO backend (shared backend by default)
+        """
+        self.__gpio = gpio or get_gpio()
         self.__started = False
 
         self.__pin_states = {
-            self.__in_left_forward: GPIO.LOW,
-            self.__in_left_backward: GPIO.LOW,
-            self.__in_right_forward: GPIO.LOW,
-            self.__in_right_backward: GPIO.LOW,
+            self.__in_left_forward: self.__gpio.LOW,
+            self.__in_left_backward: self.__gpio.LOW,
+            self.__in_right_forward: self.__gpio.LOW,
+            self.__in_right_backward: self.__gpio.LOW,
         }
 
-        GPIO.setmode(GPIO.BCM)
+        self.__gpio.setmode(self.__gpio.BCM)
 
-        GPIO.setup(self.__in_left_forward, GPIO.OUT)
-        GPIO.setup(self.__in_left_backward, GPIO.OUT)
-        GPIO.setup(self.__en1, GPIO.OUT)
-        GPIO.output(self.__in_left_forward, GPIO.LOW)
-        GPIO.output(self.__in_left_backward, GPIO.LOW)
+        self.__gpio.setup(self.__in_left_forward, self.__gpio.OUT)
+        self.__gpio.setup(self.__in_left_backward, self.__gpio.OUT)
+        self.__gpio.setup(self.__en1, self.__gpio.OUT)
+        self.__gpio.output(self.__in_left_forward, self.__gpio.LOW)
+        self.__gpio.output(self.__in_left_backward, self.__gpio.LOW)
 
-        GPIO.setup(self.__in_right_forward, GPIO.OUT)
-        GPIO.setup(self.__in_right_backward, GPIO.OUT)
-        GPIO.setup(self.__en2, GPIO.OUT)
-        GPIO.output(self.__in_right_forward, GPIO.LOW)
-        GPIO.output(self.__in_right_backward, GPIO.LOW)
+        self.__gpio.setup(self.__in_right_forward, self.__gpio.OUT)
+        self.__gpio.setup(self.__in_right_backward, self.__gpio.OUT)
+        self.__gpio.setup(self.__en2, self.__gpio.OUT)
+        self.__gpio.output(self.__in_right_forward, self.__gpio.LOW)
+        self.__gpio.output(self.__in_right_backward, self.__gpio.LOW)
 
-        self.__p1 = GPIO.PWM(self.__en1, 1000)
-        self.__p2 = GPIO.PWM(self.__en2, 1000)
+        self.__p1 = self.__gpio.PWM(self.__en1, 1000)
+        self.__p2 = self.__gpio.PWM(self.__en2, 1000)
 
     def close(self):
         self.set_wheel_state(WheelsController.Wheel.LEFT, WheelsController.WheelState.STOPPED)
         self.set_wheel_state(WheelsController.Wheel.RIGHT, WheelsController.WheelState.STOPPED)
-        GPIO.cleanup()
+        self.__gpio.cleanup()
 
     def __start(self):
         # TODO:  allow speed change with eg.: self.__p1.ChangeDutyCycle(50)
@@ -68,7 +73,7 @@ class WheelsController:
     def __change_pin_state(self, pin: int, state: int):
         if self.__pin_states[pin] == state:
             return
-        GPIO.output(pin, state)
+        self.__gpio.output(pin, state)
         self.__pin_states[pin] = state
 
     def set_wheel_state(self, wheel: int, state: int):
@@ -79,14 +84,14 @@ class WheelsController:
             [forward_pin, backward_pin] = self.__get_wheel_pins(wheel)
 
             if state == WheelsController.WheelState.STOPPED:
-                self.__change_pin_state(forward_pin, GPIO.LOW)
-                self.__change_pin_state(backward_pin, GPIO.LOW)
+                self.__change_pin_state(forward_pin, self.__gpio.LOW)
+                self.__change_pin_state(backward_pin, self.__gpio.LOW)
             elif state == WheelsController.WheelState.FORWARD:
-                self.__change_pin_state(forward_pin, GPIO.HIGH)
-                self.__change_pin_state(backward_pin, GPIO.LOW)
+                self.__change_pin_state(forward_pin, self.__gpio.HIGH)
+                self.__change_pin_state(backward_pin, self.__gpio.LOW)
             elif state == WheelsController.WheelState.BACKWARD:
-                self.__change_pin_state(forward_pin, GPIO.LOW)
-                self.__change_pin_state(backward_pin, GPIO.HIGH)
+                self.__change_pin_state(forward_pin, self.__gpio.LOW)
+                self.__change_pin_state(backward_pin, self.__gpio.HIGH)
 
         except ValueError as e:
             print(e)
@@ -6,6 +6,9 @@ from src.gui.views.view_base import ViewBase
 
 
 class ScoreboardView(ViewBase):
+    __STATIC_LAYER = 0
+    __WIDGETS_LAYER = 1
+
     def __init__(self, on_left_player_point: Callable, on_right_player_point: Callable):
         self.__on_left_player_point = on_left_player_point
         self.__on_right_player_point = on_right_player_point
@@ -29,6 +32,12 @@ class ScoreboardView(ViewBase):
         self.__left_set_points_label.set_pos((width // 2 - 30, height - 42))
         self.__right_set_points_label.set_pos((width // 2 + 30, height - 42))
 
+        gui.add_widgets((
+            Label(text='|', pos=(width // 2, height // 2), font_size=6, font_thickness=3),  # Points separator
+            Label(text='|', pos=(width // 2, height - 42), font_size=2, font_thickness=1),  # Set points separator
+        ), ScoreboardView.__STATIC_LAYER)
+        gui.set_layer_static(ScoreboardView.__STATIC_LAYER)
+
         gui.add_widgets((
             Button(text='Add point to left', pos=(width // 2 - 160, 40), padding=16,
                    on_click=lambda *_: self.__on_left_player_point(), font_size=1),
@@ -36,20 +45,16 @@ class ScoreboardView(ViewBase):
                    on_click=lambda *_: self.__on_right_player_point(), font_size=1),
 
             self.__left_points_label,
-            Label(text='|', pos=(width // 2, height // 2), font_size=6, font_thickness=3),  # Points separator
             self.__right_points_label,
 
             self.__left_set_points_label,
-            Label(text='|', pos=(width // 2, height - 42), font_size=2, font_thickness=1),  # Set points separator
             self.__right_set_points_label
-        ))
+        ), ScoreboardView.__WIDGETS_LAYER)
 
     def update_points(self, left_player_points: int, right_player_points: int):
         self.__left_points_label.set_text(str(left_player_points))
         self.__right_points_label.set_text(str(right_player_points))
-        self.__gui.redraw()
 
     def update_set_points(self, left_player_set_points: int, right_player_set_points: int):
         self.__left_set_points_label.set_text(str(left_player_set_points))
         self.__right_set_points_label.set_text(str(right_player_set_points))
-        self.__gui.redraw()
@@ -1,79 +1,122 @@
+import cv2
+import numpy as np
+
+from math import ceil, sqrt
 from src.modules.workbench.neural_network.network import NeuralNetwork
 from src.common.math_utils import clamp_f, mix
-from src.gui.core.circle import Circle
-from src.gui.core.line import Line
-from src.gui.core.widget import Widget
+from src.gui.core.image import Image
 from src.modules.workbench.view import WorkbenchView
 
 
-def visualize_network(network: NeuralNetwork, view_x: float, view_y: float, view_width: float, view_height: float):
-    layers = network.layers
-    connections = network.connections
-
-    widgets: list[Widget] = []
-
-    positions: list[list[tuple[int, int]]] = []
-    padding = 0.05
-
-    def transpose_pos(pos: tuple[int, int]):
-        return (int(pos[0] * view_width + view_x * WorkbenchView.VIEW_SIZE),
-                int(WorkbenchView.VIEW_SIZE + (pos[1] - WorkbenchView.VIEW_SIZE) * view_height +
-                    view_y * WorkbenchView.VISUALISATION_SIZE))
-
-    def add_node_circle(layer_index: int, neuron_index: int):
-        pos = positions[layer_index][neuron_index]
-        neuron_ = layers[layer_index][neuron_index]
-
-        value = clamp_f(neuron_.value, -1, 1)
-        neuron_color = (
-            mix(241, 80, value),
-            mix(239, 83, value),
-            mix(236, 239, value),
-        ) if value > 0 else (
-            mix(241, 101, -value),
-            mix(239, 204, -value),
-            mix(236, 156, -value),
-        )
-
-        widgets.append(
-            Circle(transpose_pos(pos), radius=int(WorkbenchView.VISUALISATION_SIZE * 0.025 * view_height),
-                   background_color=neuron_color),
-        )
-
-    largest_layer_size = max(map(len, layers))
-
-    for i, layer in enumerate(layers):
-        y = 1 - (padding + (i / max(1, (len(layers) - 1))) * (1. - 2. * padding))
-        positions.append([])
-
-        for j, neuron in enumerate(layer):
-            x = padding + (0.5 + ((j + 0.5) - len(layer) / 2.0) / max(1, (largest_layer_size - 1))) * \
-                (1. - 2. * padding)
-            positions[i].append((
-                int(x * WorkbenchView.VIEW_SIZE),
-                WorkbenchView.VIEW_SIZE + int(y * WorkbenchView.VISUALISATION_SIZE)
-            ))
-
-    for connection in connections:
-        from_pos = positions[connection[0][0]][connection[0][1]]
-        to_pos = positions[connection[1][0]][connection[1][1]]
-
-        weight = clamp_f(connection[2], -1, 1)
-        connection_color = (
-            mix(241, 80, weight),
-            mix(239, 83, weight),
-            mix(236, 239, weight),
-        ) if weight >= 0 else (
-            mix(241, 101, -weight),
-            mix(239, 204, -weight),
-            mix(236, 156, -weight),
-        )
-        widgets.append(
-            Line(pos_start=transpose_pos(from_pos), pos_end=transpose_pos(to_pos), color=connection_color)
-        )
-
-    for i, layer in enumerate(layers):
-        for j in range(len(layer)):
-            add_node_circle(i, j)
-
-    return widgets
+def _value_color(value: float):
+    value = clamp_f(value, -1, 1)
+    return (
+        mix(241, 80, value),
+        mix(239, 83, value),
+        mix(236, 239, value),
+    ) if value >= 0 else (
+        mix(241, 101, -value),
+        mix(239, 204, -value),
+        mix(236, 156, -value),
+    )
+
+
+class NetworkVisualizer:
+    """
+    Draws networks into a single image shown below the simulation view.
+    Connections depend only on the network structure and weights, so they are rendered once per change and only
+    neurons are redrawn with their current values on every refresh.
+    """
+    __PADDING = 0.05
+
+    def __init__(self, background_color=(56, 50, 38)):
+        self.__size = (WorkbenchView.VIEW_SIZE, WorkbenchView.VISUALISATION_SIZE)
+        self.__background_color = background_color
+        self.__widget = Image(pos=(0, WorkbenchView.VIEW_SIZE), size=self.__size, fill=background_color)
+
+        self.__topology_key: tuple = ()
+        self.__topology_image = self.__allocate_image()
+        self.__neurons: list[tuple[NeuralNetwork, list[list[tuple[int, int]]], int]] = []
+
+        # Image widget keeps a reference to the image, so the next frame is drawn into the other buffer
+        self.__frames = [self.__allocate_image(), self.__allocate_image()]
+        self.__frame_index = 0
+
+    def __allocate_image(self):
+        return np.full(shape=(self.__size[1], self.__size[0], 3), fill_value=self.__background_color,
+                       dtype=np.uint8)
+
+    @property
+    def widget(self):
+        return self.__widget
+
+    @staticmethod
+    def __structure_key(network: NeuralNetwork):
+        return tuple(map(len, network.layers)), tuple(network.connections)
+
+    def __neuron_positions(self, network: NeuralNetwork, view_x: float, view_y: float, view_width: float,
+                           view_height: float):
+        layers = network.layers
+        largest_layer_size = max(map(len, layers))
+        padding = NetworkVisualizer.__PADDING
+
+        positions: list[list[tuple[int, int]]] = []
+        for i, layer in enumerate(layers):
+            y = 1 - (padding + (i / max(1, (len(layers) - 1))) * (1. - 2. * padding))
+            positions.append([])
+
+            for j in range(len(layer)):
+                x = padding + (0.5 + ((j + 0.5) - len(layer) / 2.0) / max(1, (largest_layer_size - 1))) * \
+                    (1. - 2. * padding)
+                positions[i].append((
+                    int(x * self.__size[0] * view_width + view_x * self.__size[0]),
+                    int(y * self.__size[1] * view_height + view_y * self.__size[1])
+                ))
+        return positions
+
+    def __render_topology(self):
+        self.__topology_image[:] = self.__background_color
+        for network, positions, _ in self.__neurons:
+            for (from_layer, from_neuron), (to_layer, to_neuron), weight in network.connections:
+                cv2.line(self.__topology_image, positions[from_layer][from_neuron], positions[to_layer][to_neuron],
+                         _value_color(weight), thickness=1, lineType=cv2.LINE_AA)
+
+    def update(self, networks: list[NeuralNetwork]):
+        """
+        Draws given networks in a grid and updates the widget
+
+        Args:
+            networks: networks to visualize (eg. best individual of each species)
+        """
+        horizontal_cells = ceil(sqrt(len(networks)))
+        vertical_cells = ceil(len(networks) / max(1, horizontal_cells))
+        cell_width = 1 / max(1, horizontal_cells)
+        cell_height = 1 / max(1, vertical_cells)
+
+        topology_key = (horizontal_cells, vertical_cells, tuple(map(self.__structure_key, networks)))
+        if topology_key != self.__topology_key:
+            self.__neurons = []
+            for i, network in enumerate(networks):
+                x_i = i % horizontal_cells
+                y_i = i // horizontal_cells
+                self.__neurons.append((
+                    network,
+                    self.__neuron_positions(network, cell_width * x_i, cell_height * y_i, cell_width, cell_height),
+                    int(WorkbenchView.VISUALISATION_SIZE * 0.025 * cell_height)
+                ))
+            self.__render_topology()
+            self.__topology_key = topology_key
+        else:
+            # Networks with the same structure might be different objects holding different neuron values
+            self.__neurons = [(network, positions, radius) for network, (_, positions, radius) in
+                              zip(networks, self.__neurons)]
+
+        frame = self.__frames[self.__frame_index]
+        self.__frame_index = (self.__frame_index + 1) % len(self.__frames)
+        np.copyto(frame, self.__topology_image)
+        for network, positions, radius in self.__neurons:
+            for layer, layer_positions in zip(network.layers, positions):
+                for neuron, pos in zip(layer, layer_positions):
+                    cv2.circle(frame, pos, radius, _value_color(neuron.value), cv2.FILLED, cv2.LINE_AA)
+
+        self.__widget.set_image(frame)
@@ -1,8 +1,8 @@
 import random
 import math
-from typing import Optional
+import numpy as np
 
-from src.common.math_utils import distance_sqr
+from typing import Optional
 from src.gui.core.gui import GUI
 from src.modules.robot.robot_controller import RobotController
 from src.modules.workbench.common.steering import Steering, KeyboardSteering
@@ -13,19 +13,28 @@ from src.modules.workbench.simulations.room import RoomSimulation
 
 class CatStalkerSimulation(PhysicsSimulationBase):
     _SCALE = 0.1
-    __CAT_DETECTION_FREQUENCY = 1  # Simulates frequency of tensorflow objects detection from camera image
+    _CAT_DETECTION_FREQUENCY = 1  # Simulates frequency of tensorflow objects detection from camera image
+    _MAX_CAT_DETECTION_DISTANCE = 3
 
     class _Cat:
         __STEERING_CHANGE_FREQUENCY = 1
 
-        def __init__(self, scale: float, pos=(0, 0)):
+        def __init__(self, scale: float, pos=(0, 0), render=True, rng: Optional[random.Random] = None):
+            """
+            Args:
+                scale: simulation scale
+                pos: initial position
+                render: whether the cat should be rendered
+                rng: random generator of the cat's movement (global one by default)
+            """
             self.__scale = scale
+            self.__random = rng or random
             self.__movement_speed = 0.1
             self.__rotation_speed = math.pi * 0.5
 
             self.__box = PhysicsSimulationBase.Box(pos=pos,
                                                    size=(0.4 * self.__scale, 0.4 * self.__scale),
-                                                   color=(128, 255, 128), collision_type=0x0008)
+                                                   color=(128, 255, 128), collision_type=0x0008, render=render)
             for shape in self.__box.body.shapes:
                 shape.friction = 0.99
                 shape.elasticity = 0.01
@@ -46,11 +55,11 @@ class CatStalkerSimulation(PhysicsSimulationBase):
             if self.__steering_change_timer > self.__STEERING_CHANGE_FREQUENCY:
                 self.__steering_change_timer -= self.__STEERING_CHANGE_FREQUENCY
 
-                do_nothing = random.random() < 0.75
-                self.__steering.LEFT = random.random() > 0.5 if not do_nothing else False
-                self.__steering.RIGHT = random.random() > 0.5 if not do_nothing else False
-                self.__steering.FORWARD = random.random() > 0.5 if not do_nothing else False
-                self.__steering.BACKWARD = random.random() > 0.5 if not do_nothing else False
+                do_nothing = self.__random.random() < 0.75
+                self.__steering.LEFT = self.__random.random() > 0.5 if not do_nothing else False
+                self.__steering.RIGHT = self.__random.random() > 0.5 if not do_nothing else False
+                self.__steering.FORWARD = self.__random.random() > 0.5 if not do_nothing else False
+                self.__steering.BACKWARD = self.__random.random() > 0.5 if not do_nothing else False
 
             if self.__steering.FORWARD:
                 self.__box.body.set_velocity(
@@ -98,24 +107,43 @@ class CatStalkerSimulation(PhysicsSimulationBase):
         self._add_objects(*self.__robot.objects())
         self._add_objects(self.__cat.objects())
 
-    def __estimate_cat_position(self) -> Optional[dict[str, float]]:
-        max_distance = 3
+    @staticmethod
+    def estimate_cat_positions(robot_positions: np.ndarray, robot_angles: np.ndarray, cat_positions: np.ndarray,
+                               scale: float):
+        """
+        Simulates camera based cat detection for any number of robot and cat pairs at once
+
+        Args:
+            robot_positions: array of shape (N, 2) with robots positions
+            robot_angles: array of shape (N,) with robots angles
+            cat_positions: array of shape (N, 2) with positions of cats paired with robots
+            scale: simulation scale
+
+        Returns: tuple of arrays of shape (N,): visibility mask, cat's normalized x coordinate relative to camera view
+        and distance between robot and cat (in the units the controller was tuned with: square root of the squared
+        distance divided by the scale; cats are visible below _MAX_CAT_DETECTION_DISTANCE * scale)
+        """
+        offsets = cat_positions - robot_positions
+        distances = np.sqrt((offsets[:, 0] ** 2 + offsets[:, 1] ** 2) / scale)
+
+        relative_angles = np.arctan2(offsets[:, 1], offsets[:, 0]) - robot_angles - math.pi / 2.0
+        relative_angles = (relative_angles + math.pi) % (2 * math.pi) - math.pi
+
         max_angle = RobotController.VIEW_ANGLE / 2.0
-        cat_robot_distance = distance_sqr(self.__robot.pos, self.__cat.pos) / CatStalkerSimulation._SCALE
-        if cat_robot_distance < (max_distance * CatStalkerSimulation._SCALE) ** 2:
-            relative_angle = math.atan2(self.__cat.pos[1] - self.__robot.pos[1],
-                                        self.__cat.pos[0] - self.__robot.pos[0]) - self.__robot.angle - math.pi / 2.0
-            while relative_angle > math.pi:
-                relative_angle -= 2 * math.pi
-            while relative_angle < -math.pi:
-                relative_angle += 2 * math.pi
-
-            if max_angle > relative_angle > -max_angle:
-                return {
-                    "distance": math.sqrt(cat_robot_distance),
-                    "x": relative_angle / max_angle
-                }
+        visible = (distances < CatStalkerSimulation._MAX_CAT_DETECTION_DISTANCE * scale) & \
+            (np.abs(relative_angles) < max_angle)
+        return visible, relative_angles / max_angle, distances
 
+    def __estimate_cat_position(self) -> Optional[dict[str, float]]:
+        visible, x, distances = self.estimate_cat_positions(np.array([self.__robot.pos]),
+                                                            np.array([self.__robot.angle]),
+                                                            np.array([self.__cat.pos]),
+                                                            CatStalkerSimulation._SCALE)
+        if visible[0]:
+            return {
+                "distance": float(distances[0]),
+                "x": float(x[0])
+            }
         return None
 
     def _on_update(self, delta_time: float):
@@ -124,12 +152,13 @@ class CatStalkerSimulation(PhysicsSimulationBase):
         estimated_cat_position: Optional[dict[str, float]] = None
 
         self.__cat_detection_timer += delta_time
-        if self.__cat_detection_timer > CatStalkerSimulation.__CAT_DETECTION_FREQUENCY:
-            self.__cat_detection_timer -= CatStalkerSimulation.__CAT_DETECTION_FREQUENCY
+        if self.__cat_detection_timer > CatStalkerSimulation._CAT_DETECTION_FREQUENCY:
+            self.__cat_detection_timer -= CatStalkerSimulation._CAT_DETECTION_FREQUENCY
             estimated_cat_position = self.__estimate_cat_position()
             self.__robot.set_color((255, 1, 0) if estimated_cat_position else Robot.DEFAULT_COLOR)
 
-        movement = self.__robot_controller.update(self.__robot.get_sensors_values(), estimated_cat_position)
+        movement = self.__robot_controller.update(self.__robot.get_sensors_values(), estimated_cat_position,
+                                                  delta_time)
 
         self.__robot.steering.FORWARD = movement[RobotController.Direction.FORWARD]
         self.__robot.steering.BACKWARD = movement[RobotController.Direction.BACKWARD]
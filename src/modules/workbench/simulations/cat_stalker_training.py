@@ -0,0 +1,221 @@
+import math
+import random
+import numpy as np
+
+from multiprocessing import Pool
+from typing import Optional
+from src.common.math_utils import clamp_f
+from src.modules.robot.robot_controller import RobotController, RobotControllerConfig
+from src.modules.workbench.common.steering import Steering
+from src.modules.workbench.simulations.cat_stalker import CatStalkerSimulation
+from src.modules.workbench.simulations.physics_simulation_base import PhysicsSimulationBase
+from src.modules.workbench.simulations.robot import Robot
+from src.modules.workbench.simulations.room import RoomSimulation
+
+
+# Headless version of CatStalkerSimulation. It runs many cat and robot pairs in a single physics space without
+# rendering anything and scores robot controllers by how well they keep track of their cats.
+# Every config gets the same spawn points and cat movements, so scores of configs evaluated together are comparable.
+class CatStalkerTraining(PhysicsSimulationBase):
+    _SCALE = CatStalkerSimulation._SCALE
+    __DELTA_TIME = 1. / 30.
+    __SPAWN_JITTER = 0.4
+    __ROBOT_SPAWN_POINTS = [(0., 0.), (0., 3.5), (-2.75, 7.5)]
+    __CAT_SPAWN_POINTS = [(0., 3.5), (-2.75, 3.5), (-2.75, 7.5), (1.25, 7.5)]
+    __WALL_HIT_THRESHOLD = 0.95
+    __WALL_HIT_PENALTY = 0.5
+    # Config values compared with normalized sensor values (at most 1). Sensor values must be able to exceed them,
+    # so they are kept below 1
+    __NORMALIZED_CONFIG_KEYS = ('front_sensor_obstacle_threshold', 'side_sensor_obstacle_threshold')
+    __MAX_NORMALIZED_THRESHOLD = 0.99
+
+    def __init__(self, configs: list[RobotControllerConfig], pairs_per_config=4, seed: Optional[int] = None):
+        super().__init__(None, gravity=(0, 0), damping=0.02)
+        spawn_random = random.Random(seed)
+        spawns = [CatStalkerTraining.__random_spawn(spawn_random) for _ in range(pairs_per_config)]
+        cat_seeds = [spawn_random.getrandbits(32) for _ in range(pairs_per_config)]
+        noise_seeds = [spawn_random.getrandbits(32) for _ in range(pairs_per_config)]
+
+        self.__configs = configs
+        self.__pairs_per_config = pairs_per_config
+        pairs_count = len(configs) * pairs_per_config
+
+        self.__robots: list[Robot] = []
+        self.__cats: list[CatStalkerSimulation._Cat] = []
+        self.__controllers: list[RobotController] = []
+        self.__sensor_noise_randoms: list[random.Random] = []
+        network = RobotController.load_best_ai_player()
+        for i in range(pairs_count):
+            robot_pos, robot_angle, cat_pos = spawns[i % pairs_per_config]
+            robot = Robot(scale=self._SCALE, steering=Steering(), pos=robot_pos, angle=robot_angle, can_stuck=False,
+                          render=False)
+            cat = CatStalkerSimulation._Cat(scale=self._SCALE, pos=cat_pos, render=False,
+                                            rng=random.Random(cat_seeds[i % pairs_per_config]))
+            # Cats of different pairs must not interact with each other nor with robots
+            cat.objects().body.set_collision_filtering(categories=0x0008, mask=0xFFFFFFFF ^ (0x0002 | 0x0008))
+
+            self.__sensor_noise_randoms.append(random.Random(noise_seeds[i % pairs_per_config]))
+            self.__robots.append(robot)
+            self.__cats.append(cat)
+            self.__controllers.append(
+                RobotController(config=configs[i // pairs_per_config], network=network, verbose=False)
+            )
+
+        self.__cat_detection_timer = 0.0
+        self.__detections_count = 0
+        self.__steps_count = 0
+        self.__visible_counts = np.zeros(pairs_count)
+        self.__proximity_sums = np.zeros(pairs_count)
+        self.__wall_hits = np.zeros(pairs_count)
+
+        self._on_init()
+
+    @staticmethod
+    def __random_spawn(rng: random.Random) -> tuple[tuple[float, float], float, tuple[float, float]]:
+        """
+        Returns: robot position, robot angle and cat position
+        """
+        jitter = CatStalkerTraining.__SPAWN_JITTER
+        scale = CatStalkerTraining._SCALE
+        robot_x, robot_y = rng.choice(CatStalkerTraining.__ROBOT_SPAWN_POINTS)
+        robot_pos = ((robot_x + rng.uniform(-jitter, jitter)) * scale, (robot_y + rng.uniform(-jitter, jitter)) * scale)
+        robot_angle = rng.uniform(-math.pi, math.pi)
+        cat_x, cat_y = rng.choice(CatStalkerTraining.__CAT_SPAWN_POINTS)
+        cat_pos = ((cat_x + rng.uniform(-jitter, jitter)) * scale, (cat_y + rng.uniform(-jitter, jitter)) * scale)
+        return robot_pos, robot_angle, cat_pos
+
+    def _on_init(self):
+        layout = RoomSimulation.DEFAULT_ROOM_LAYOUT
+        for x, y, width, height in layout:
+            self._add_objects(PhysicsSimulationBase.Box(pos=(x * self._SCALE, y * self._SCALE),
+                                                        size=(width * self._SCALE, height * self._SCALE),
+                                                        dynamic=False, render=False))
+
+        for robot, cat in zip(self.__robots, self.__cats):
+            self._add_objects(*robot.objects())
+            self._add_objects(cat.objects())
+
+    def __estimate_cat_positions(self) -> list[Optional[dict[str, float]]]:
+        visible, x, distances = CatStalkerSimulation.estimate_cat_positions(
+            np.array([robot.pos for robot in self.__robots]),
+            np.array([robot.angle for robot in self.__robots]),
+            np.array([cat.pos for cat in self.__cats]),
+            self._SCALE
+        )
+
+        self.__detections_count += 1
+        self.__visible_counts += visible
+        self.__proximity_sums += np.where(
+            visible, 1.0 - distances / (CatStalkerSimulation._MAX_CAT_DETECTION_DISTANCE * self._SCALE), 0.0
+        )
+
+        return [{"distance": float(distances[i]), "x": float(x[i])} if visible[i] else None
+                for i in range(len(self.__robots))]
+
+    def _on_update(self, delta_time: float):
+        for cat in self.__cats:
+            cat.update(delta_time)
+
+        estimated_cat_positions: list[Optional[dict[str, float]]] = [None] * len(self.__robots)
+
+        self.__cat_detection_timer += delta_time
+        if self.__cat_detection_timer > CatStalkerSimulation._CAT_DETECTION_FREQUENCY:
+            self.__cat_detection_timer -= CatStalkerSimulation._CAT_DETECTION_FREQUENCY
+            estimated_cat_positions = self.__estimate_cat_positions()
+
+        self.__steps_count += 1
+        for i, (robot, controller) in enumerate(zip(self.__robots, self.__controllers)):
+            sensors = robot.get_sensors_values(rng=self.__sensor_noise_randoms[i])
+            if sensors[0] > CatStalkerTraining.__WALL_HIT_THRESHOLD:
+                self.__wall_hits[i] += 1
+
+            movement = controller.update(sensors, estimated_cat_positions[i], delta_time)
+
+            robot.steering.FORWARD = movement[RobotController.Direction.FORWARD]
+            robot.steering.BACKWARD = movement[RobotController.Direction.BACKWARD]
+            robot.steering.LEFT = movement[RobotController.Direction.LEFT]
+            robot.steering.RIGHT = movement[RobotController.Direction.RIGHT]
+
+            robot.update(delta_time, self)
+
+    def run(self, duration: float) -> list[float]:
+        """
+        Args:
+            duration: simulated time in seconds
+
+        Returns: list of scores for each config (averaged over its cat and robot pairs)
+        """
+        for _ in range(int(duration / CatStalkerTraining.__DELTA_TIME)):
+            self._step(CatStalkerTraining.__DELTA_TIME)
+
+        return self.scores()
+
+    def scores(self) -> list[float]:
+        detections_count = max(1, self.__detections_count)
+        pair_scores = self.__visible_counts / detections_count + self.__proximity_sums / detections_count - \
+            self.__wall_hits / max(1, self.__steps_count) * CatStalkerTraining.__WALL_HIT_PENALTY
+        return pair_scores.reshape(len(self.__configs), self.__pairs_per_config).mean(axis=1).tolist()
+
+    @staticmethod
+    def evaluate(configs: list[RobotControllerConfig], duration=60., pairs_per_config=4, processes=1,
+                 seed: Optional[int] = None) -> list[float]:
+        """
+        Scores given configs. With more than one process, configs are split into chunks and each chunk is simulated
+        in a separate physics space with the same seed, so all configs are scored on the same spawns.
+        """
+        if processes <= 1:
+            training = CatStalkerTraining(configs, pairs_per_config, seed)
+            scores = training.run(duration)
+            training.close()
+            return scores
+
+        if seed is None:
+            seed = random.getrandbits(32)
+        chunk_size = math.ceil(len(configs) / processes)
+        chunks = [configs[i:i + chunk_size] for i in range(0, len(configs), chunk_size)]
+        with Pool(processes) as pool:
+            chunk_scores = pool.starmap(CatStalkerTraining.evaluate, [
+                (chunk, duration, pairs_per_config, 1, seed) for chunk in chunks
+            ])
+        return [score for scores in chunk_scores for score in scores]
+
+    @staticmethod
+    def mutate(config: RobotControllerConfig, mutation_scale: float) -> RobotControllerConfig:
+        """
+        Returns: copy of the config with each value scaled randomly by up to mutation_scale (normalized thresholds are
+                 kept in the [0, 1) range, so mutations cannot disable obstacle reactions)
+        """
+        values = {key: value * (1.0 + random.uniform(-mutation_scale, mutation_scale))
+                  for key, value in config.to_dict().items()}
+        for key in CatStalkerTraining.__NORMALIZED_CONFIG_KEYS:
+            values[key] = clamp_f(values[key], 0., CatStalkerTraining.__MAX_NORMALIZED_THRESHOLD)
+        return RobotControllerConfig(**values)
+
+    @staticmethod
+    def tune(base_config: RobotControllerConfig, generations=10, population_size=16, mutation_scale=0.2,
+             duration=60., pairs_per_config=4, processes=1, seed=0) -> tuple[RobotControllerConfig, float]:
+        """
+        Simple hill climbing over RobotControllerConfig values. Each generation the best config is scored again
+        together with its candidates on the same seeded spawns, so they are not compared across different samples.
+
+        Returns: best found config and its score from the last generation it was evaluated in
+        """
+        best_config = base_config
+        best_score = CatStalkerTraining.evaluate([base_config], duration, pairs_per_config, processes, seed)[0] \
+            if generations <= 0 else float('-inf')
+
+        for generation in range(generations):
+            candidates = [CatStalkerTraining.mutate(best_config, mutation_scale) for _ in range(population_size)]
+            scores = CatStalkerTraining.evaluate([best_config] + candidates, duration, pairs_per_config, processes,
+                                                 seed + generation)
+
+            best_score = scores[0]
+            best_index = scores.index(max(scores))
+            if best_index > 0:
+                best_config, best_score = candidates[best_index - 1], scores[best_index]
+            print(f"Generation: {generation}; best score: {best_score}; config: {best_config.to_dict()}")
+
+        return best_config, best_score
+
+if __name__ == "__main__":
+    CatStalkerTraining.tune(RobotControllerConfig(), processes=4)
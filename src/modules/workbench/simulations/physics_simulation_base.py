@@ -13,6 +13,9 @@ from src.modules.workbench.view import WorkbenchView
 
 
 class PhysicsSimulationBase:
+    _STATIC_OBJECTS_LAYER = 0
+    _OBJECTS_LAYER = 1
+
     class _Object:
         def __init__(self, pos=(0.0, 0.0), color=(255, 255, 255)):
             self._pos = pos
@@ -121,7 +124,7 @@ class PhysicsSimulationBase:
             self.widget.set_angle(self.body.angle)
             self.widget.set_background_color(self._color)
 
-    def __init__(self, gui: GUI, gravity=(0.0, 0.0), damping=0.99):
+    def __init__(self, gui: Optional[GUI], gravity=(0.0, 0.0), damping=0.99):
         self._gui = gui
         self._is_running = False
         self._simulate = False
@@ -139,12 +142,17 @@ class PhysicsSimulationBase:
 
         self._simulation_process: Optional[Thread] = None
 
+        if self._gui is not None:
+            self._gui.set_layer_static(PhysicsSimulationBase._STATIC_OBJECTS_LAYER)
+
     @abstractmethod
     def close(self):
         self._is_running = False
         self._remove_objects(*self.__objects)
         if self._simulation_process is not None:
             self._simulation_process.join()
+        if self._gui is not None:
+            self._gui.set_layer_static(PhysicsSimulationBase._STATIC_OBJECTS_LAYER, False)
 
     def _start(self):
         self._simulation_process = Thread(target=self.__simulation_thread, daemon=True)
@@ -188,7 +196,9 @@ class PhysicsSimulationBase:
             if obj.shape:
                 self.__space.add(obj.shape)
             if obj.widget is not None:
-                self._gui.add_widgets((obj.widget,))
+                self._gui.add_widgets((obj.widget,), PhysicsSimulationBase._STATIC_OBJECTS_LAYER if
+                                      obj.body is not None and obj.body.body_type == pymunk.Body.STATIC else
+                                      PhysicsSimulationBase._OBJECTS_LAYER)
 
     def ray_cast(self, from_point: tuple[float, float], to_point: tuple[float, float], radius=0.00001,
                  mask=0xFFFFFFFF):
@@ -209,6 +219,11 @@ class PhysicsSimulationBase:
     def _set_camera_pos(self, pos: tuple[float, float]):
         self.__camera_pos = pos
 
+    def _step(self, delta_time: float, steps=1):
+        for _ in range(steps):
+            self._on_update(delta_time)
+            self.__space.step(delta_time)
+
     def __simulation_thread(self):
         self._is_running = True
 
@@ -226,13 +241,9 @@ class PhysicsSimulationBase:
             # counter += 1
             last = now
 
-            steps = 100 if self._simulate else 1
-            for _ in range(steps):
-                self._on_update(delta_time)
-                self.__space.step(delta_time)
+            self._step(delta_time, steps=100 if self._simulate else 1)
             for obj in self.__objects:
                 obj.update_visuals(self.__camera_pos)
-            self._gui.redraw()
             if not self._simulate:
                 # Keep the framerate at 60fps
                 time.sleep(max(0.0, 1.0 / 60.0 - (time.time() - now)))
@@ -4,6 +4,7 @@ from src.common.math_utils import mix, clamp_f
 from src.modules.workbench.common.steering import Steering
 from src.modules.workbench.simulations.physics_simulation_base import PhysicsSimulationBase
 from math import cos, sin, pi, sqrt
+from typing import Optional
 
 
 class Robot:
@@ -14,7 +15,8 @@ class Robot:
     _SAFE_DISTANCE_FROM_WALL = 0.10
     DEFAULT_COLOR = (255, 196, 128)
 
-    def __init__(self, scale: float, steering: Steering = Steering(), pos=(0., 0.), can_stuck=True, render=True):
+    def __init__(self, scale: float, steering: Steering = Steering(), pos=(0., 0.), angle=0., can_stuck=True,
+                 render=True):
         self.__delta_timer = 0.0
         self.__arrived = False
         self.__arrived_time = 0.0
@@ -35,6 +37,7 @@ class Robot:
         self.__box = PhysicsSimulationBase.Box(pos=pos,
                                                size=(0.15 * self.__scale, 0.3 * self.__scale),
                                                color=Robot.DEFAULT_COLOR, collision_type=0x0002, render=render)
+        self.__box.body.set_angle(angle)
         # Prevent from colliding with other robots
         self.__box.body.set_collision_filtering(categories=0x0002, mask=0xFFFFFFFF ^ 0x0002)
         for shape in self.__box.body.shapes:
@@ -129,10 +132,11 @@ class Robot:
         self.__box.body.set_velocity((0., 0.))
         self.__box.body.set_angular_velocity(0)
 
-    def get_sensors_values(self, noise_factor=0.05):
+    def get_sensors_values(self, noise_factor=0.05, rng: Optional[random.Random] = None):
         if noise_factor > 0:
+            rng = rng or random
             return list(map(
-                lambda sensor_value: clamp_f(sensor_value + random.uniform(-noise_factor, noise_factor), 0, 1),
+                lambda sensor_value: clamp_f(sensor_value + rng.uniform(-noise_factor, noise_factor), 0, 1),
                 self.__proximity_sensors_values
             ))
         return self.__proximity_sensors_values
@@ -1,20 +1,17 @@
 import os
 import random
 import time
-from math import sqrt, inf, ceil
+from math import sqrt, inf
 from pymunk import Arbiter, Space
 from src.common.common_utils import data_dir
 from src.gui.core.gui import GUI
-from src.gui.core.rect import Rect
-from src.gui.core.widget import Widget
 from src.modules.robot.robot_controller import RobotController
 from src.modules.workbench.common.steering import KeyboardSteering
 from src.modules.workbench.evolution.evolution import Evolution, EvolutionConfig
 from src.modules.workbench.neural_network.network import NeuralNetwork
-from src.modules.workbench.neural_network.visualize import visualize_network
+from src.modules.workbench.neural_network.visualize import NetworkVisualizer
 from src.modules.workbench.simulations.physics_simulation_base import PhysicsSimulationBase
 from src.modules.workbench.simulations.robot import Robot
-from src.modules.workbench.view import WorkbenchView
 
 
 # NOTE: All length/size values in this file should be in meters except of RoomSimulation.SCALE which allows for a reasonable size preview
@@ -96,7 +93,7 @@ class RoomSimulation(PhysicsSimulationBase):
         if os.path.isfile(self.__DATA_FILE):
             self.__evolution.load_from_file(self.__DATA_FILE)
 
-        self.__network_visualization_widgets: list[Widget] = []
+        self.__network_visualizer = NetworkVisualizer()
         self.__last_visualization_timestamp = 0.
 
         self.__keyboard_steering = KeyboardSteering()
@@ -108,7 +105,7 @@ class RoomSimulation(PhysicsSimulationBase):
 
     def close(self):
         self.__keyboard_steering.close()
-        self._gui.remove_widgets(*self.__network_visualization_widgets)
+        self._gui.remove_widgets(self.__network_visualizer.widget)
         super().close()
 
     def __on_robot_to_destination_collision(self, arbiter: Arbiter, _space: Space, _data: any):
@@ -138,6 +135,7 @@ class RoomSimulation(PhysicsSimulationBase):
         for robot in self.__robots:
             self._add_objects(*robot.objects())
         self._add_objects(*self.__player.objects())
+        self._gui.add_widgets((self.__network_visualizer.widget,), self._OBJECTS_LAYER)
 
         self.__round_duration_timer = 0.
 
@@ -240,28 +238,8 @@ class RoomSimulation(PhysicsSimulationBase):
         now = time.time()
         if now - self.__last_visualization_timestamp > 0.1:
             self.__last_visualization_timestamp = now
-            self._gui.remove_widgets(*self.__network_visualization_widgets)
-            self.__network_visualization_widgets = [
-                Rect(
-                    pos=(WorkbenchView.VIEW_SIZE // 2, WorkbenchView.VIEW_SIZE + WorkbenchView.VISUALISATION_SIZE // 2),
-                    size=(WorkbenchView.VIEW_SIZE, WorkbenchView.VISUALISATION_SIZE),
-                    # background_color=(56, 50, 38)
-                    background_color=(56, 50, 38)
-                )
-            ]
             species_groups = self.__evolution.get_population_grouped_by_species()
-            horizontal_cells = ceil(sqrt(len(species_groups)))
-            vertical_cells = ceil(len(species_groups) / horizontal_cells)
-            cell_width = 1 / horizontal_cells
-            cell_height = 1 / vertical_cells
-            enum = enumerate(sorted(species_groups.values(), key=lambda ind: ind[0].species_id))
-            for i, species_individuals in enum:
-                x_i = i % horizontal_cells
-                y_i = i // horizontal_cells
-                self.__network_visualization_widgets.extend(
-                    visualize_network(species_individuals[0].genome, cell_width * x_i, cell_height * y_i, cell_width,
-                                      cell_height)
-                )
-            # self.__network_visualization_widgets.extend(visualize_network(self.__evolution.individuals[0].genome))
-            if self._is_running:
-                self._gui.add_widgets(tuple(self.__network_visualization_widgets))
+            self.__network_visualizer.update([
+                species_individuals[0].genome for species_individuals in
+                sorted(species_groups.values(), key=lambda ind: ind[0].species_id)
+            ])
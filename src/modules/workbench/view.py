@@ -8,6 +8,7 @@ from src.gui.views.view_base import ViewBase
 class WorkbenchView(ViewBase):
     VIEW_SIZE = 512
     VISUALISATION_SIZE = 256
+    CONTROLS_LAYER = 2
 
     def __init__(self, on_start_simulation: Callable[[str], None]):
         self.__gui: Optional[GUI] = None
@@ -67,7 +68,7 @@ class WorkbenchView(ViewBase):
             close_btn,
             toggle_simulation_button
         ]
-        self.__gui.add_widgets(tuple(self.__simulation_controls), 1)
+        self.__gui.add_widgets(tuple(self.__simulation_controls), WorkbenchView.CONTROLS_LAYER)
 
     def remove_simulation_controls(self):
         for control in self.__simulation_controls:
@@ -0,0 +1,110 @@
+import numpy as np
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from typing import Callable, Optional
+from src.object_detection.objectDetector import ObjectDetector, DetectionResult, Rect
+
+
+class DetectionCache:
+    """
+    Bounded cache of detection results keyed by frame sequence numbers in front of an ObjectDetector.
+    Requesting the same frame more than once returns the same (possibly pending) result instead of running the
+    inference again. Subscribers are notified once per new frame result, in the frames order.
+    """
+
+    def __init__(self, detector: ObjectDetector, size=8):
+        """
+        Args:
+            detector: detector used for frames that are not in the cache
+            size: maximum number of cached frame results
+        """
+        self.__detector = detector
+        self.__size = size
+        self.__results: OrderedDict[int, Future] = OrderedDict()
+        self.__subscribers: list[Callable[[DetectionResult], any]] = []
+        self.__last_published_sequence_number = 0
+        self.__lock = Lock()
+
+    def clear(self):
+        with self.__lock:
+            self.__results.clear()
+            self.__last_published_sequence_number = 0
+
+    def subscribe(self, callback: Callable[[DetectionResult], any]):
+        """
+        Args:
+            callback: function called (from the detector thread) with each new result that is newer than the
+                      previously published one
+        """
+        with self.__lock:
+            self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[DetectionResult], any]):
+        with self.__lock:
+            if callback in self.__subscribers:
+                self.__subscribers.remove(callback)
+
+    def request(self, image: np.ndarray, sequence_number: int, timestamp: float,
+                region: Optional[Rect] = None) -> 'Future[DetectionResult]':
+        """
+        Returns the result of the frame, running the detection only if the frame has not been requested before
+
+        Args:
+            image: frame image
+            sequence_number: sequence number of the frame
+            timestamp: capture timestamp of the frame
+            region: part of the frame to detect objects in (ignored if the frame is already cached)
+        """
+        with self.__lock:
+            future = self.__results.get(sequence_number)
+            if future is not None and not future.cancelled():
+                return future
+
+            future = self.__detector.detect_async(image, sequence_number, timestamp, region)
+            self.__results[sequence_number] = future
+            while len(self.__results) > self.__size:
+                self.__results.popitem(last=False)
+
+        future.add_done_callback(self.__publish)
+        return future
+
+    def get(self, sequence_number: int) -> Optional[DetectionResult]:
+        """Returns the completed result of the frame or None if it is not available"""
+        with self.__lock:
+            future = self.__results.get(sequence_number)
+        if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def get_latest(self) -> Optional[DetectionResult]:
+        """Returns the completed result of the most recent frame"""
+        with self.__lock:
+            futures = list(self.__results.values())
+        for future in reversed(futures):
+            if future.done() and not future.cancelled() and future.exception() is None:
+                return future.result()
+        return None
+
+    def __publish(self, future: 'Future[DetectionResult]'):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Detection failed: {future.exception()}")
+            return
+        result = future.result()
+
+        with self.__lock:
+            # Results of older frames can complete after newer ones
+            if result.sequence_number <= self.__last_published_sequence_number:
+                return
+            self.__last_published_sequence_number = result.sequence_number
+            subscribers = list(self.__subscribers)
+
+        for subscriber in subscribers:
+            # noinspection PyBroadException
+            try:
+                subscriber(result)
+            except Exception as e:
+                print(f"Detection subscriber failed: {e}")
@@ -0,0 +1,97 @@
+import time
+import cv2
+import numpy as np
+
+from typing import Optional
+
+
+class MotionGate:
+    """
+    Cheap scene change test used to skip object detection on frames that are nearly identical to the last frame
+    the detector has processed. Frames are compared as small grayscale thumbnails.
+    """
+
+    def __init__(self, thumbnail_width=64, pixel_threshold=24, changed_fraction_threshold=0.005,
+                 max_skip_duration=2.0):
+        """
+        Args:
+            thumbnail_width: width of the thumbnail frames are compared at (height keeps the aspect ratio)
+            pixel_threshold: minimum difference of thumbnail pixel values (0-255) for the pixel to count as changed
+            changed_fraction_threshold: part of changed thumbnail pixels above which the scene is considered changed
+            max_skip_duration: time in seconds after which a frame passes the gate regardless of changes
+        """
+        self.__thumbnail_width = thumbnail_width
+        self.__pixel_threshold = pixel_threshold
+        self.__changed_fraction_threshold = changed_fraction_threshold
+        self.__max_skip_duration = max_skip_duration
+
+        self.__reference: Optional[np.ndarray] = None
+        self.__thumbnail: Optional[np.ndarray] = None
+        self.__difference: Optional[np.ndarray] = None
+        self.__resized: Optional[np.ndarray] = None
+        self.__reference_time = 0.
+
+        self.__hits = 0
+        self.__skips = 0
+
+    @property
+    def hits(self):
+        """Number of frames that passed the gate"""
+        return self.__hits
+
+    @property
+    def skips(self):
+        """Number of frames that were skipped"""
+        return self.__skips
+
+    def get_statistics(self) -> dict[str, float]:
+        total = self.__hits + self.__skips
+        return {
+            'hits': self.__hits,
+            'skips': self.__skips,
+            'skip_ratio': self.__skips / total if total > 0 else 0.
+        }
+
+    def reset(self):
+        self.__reference = None
+        self.__hits = 0
+        self.__skips = 0
+
+    def __make_thumbnail(self, image: np.ndarray):
+        height, width = image.shape[:2]
+        size = (self.__thumbnail_width, max(1, round(height * self.__thumbnail_width / width)))
+        if self.__thumbnail is None or self.__thumbnail.shape[::-1] != size:
+            self.__resized = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self.__thumbnail = np.empty((size[1], size[0]), dtype=np.uint8)
+            self.__difference = np.empty_like(self.__thumbnail)
+            self.__reference = None
+
+        cv2.resize(image, size, dst=self.__resized, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.__resized, cv2.COLOR_BGR2GRAY, dst=self.__thumbnail)
+        return self.__thumbnail
+
+    def should_process(self, image: np.ndarray, force=False) -> bool:
+        """
+        Args:
+            image: BGR frame
+            force: let the frame pass regardless of changes (eg. while a target is being tracked)
+
+        Returns: True if the frame differs enough from the last passed frame and should be processed
+        """
+        thumbnail = self.__make_thumbnail(image)
+        now = time.time()
+
+        if not force and self.__reference is not None and now - self.__reference_time < self.__max_skip_duration:
+            cv2.absdiff(thumbnail, self.__reference, dst=self.__difference)
+            changed_pixels = np.count_nonzero(self.__difference > self.__pixel_threshold)
+            if changed_pixels <= self.__changed_fraction_threshold * self.__difference.size:
+                self.__skips += 1
+                return False
+
+        if self.__reference is None:
+            self.__reference = thumbnail.copy()
+        else:
+            np.copyto(self.__reference, thumbnail)
+        self.__reference_time = now
+        self.__hits += 1
+        return True
@@ -3,11 +3,14 @@ import json
 import os
 import numpy as np
 
-from threading import Thread
-from typing import Optional, List, NamedTuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Queue
+from typing import Optional, List, NamedTuple, Iterable
 from tflite_support import metadata
 
+from src.common.math_utils import clamp_f
 from src.gui.core.gui import GUI
+from src.inference.vision_scheduler import VisionScheduler
 
 try:
     # Import TFLite interpreter from tflite_runtime package if it's available.
@@ -42,6 +45,33 @@ class Detection(NamedTuple):
     categories: List[Category]
 
 
+class DetectionResult(NamedTuple):
+    """Detections of a single frame together with the frame's sequence number and capture timestamp."""
+    detections: List[Detection]
+    sequence_number: int
+    timestamp: float
+    region: Optional[Rect] = None
+    """Part of the frame the detection was performed on (None means the whole frame)"""
+
+
+def get_region_around(box: Rect, image_width: int, image_height: int, scale=2.5, min_size=160) -> Rect:
+    """
+    Returns a square region centered at the box and expanded by the given scale, shifted to fit in the image
+
+    Args:
+        box: bounding box of the object the region should contain
+        image_width: width of the whole image
+        image_height: height of the whole image
+        scale: size of the region relative to the larger side of the box
+        min_size: minimum size of the region in pixels
+    """
+    size = int(min(max((box.right - box.left) * scale, (box.bottom - box.top) * scale, min_size),
+                   image_width, image_height))
+    left = int(clamp_f((box.left + box.right - size) / 2, 0, image_width - size))
+    top = int(clamp_f((box.top + box.bottom - size) / 2, 0, image_height - size))
+    return Rect(left=left, top=top, right=left + size, bottom=top + size)
+
+
 # def edgetpu_lib_name():
 #   """Returns the library name of EdgeTPU in the current platform."""
 #   return {
@@ -51,10 +81,53 @@ class Detection(NamedTuple):
 #   }.get(platform.system(), None)
 
 class ObjectDetector:
-    def __init__(self, gui: GUI):
+    class __Slot:
+        """
+        Interpreter with its own input and output tensors. Each slot processes one frame at a time.
+        """
+
+        def __init__(self, model_path: str, num_threads: int):
+            self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.input_index = self.input_detail['index']
+
+            # From TensorFlow 2.6, the order of the outputs become undefined.
+            # Therefore, we need to sort the tensor indices of TFLite outputs and to know
+            # exactly the meaning of each output tensor. For example, if
+            # output indices are [601, 599, 598, 600], tensor names and indices aligned
+            # are:
+            #   - location: 598
+            #   - category: 599
+            #   - score: 600
+            #   - detection_count: 601
+            # because of the op's ports of TFLITE_DETECTION_POST_PROCESS
+            # (https://github.com/tensorflow/tensorflow/blob/a4fe268ea084e7d323133ed7b986e0ae259a2bc7/tensorflow/lite/kernels/detection_postprocess.cc#L47-L50).
+            sorted_output_indices = sorted(
+                [output['index'] for output in self.interpreter.get_output_details()])
+            self.output_indices = {
+                'OUTPUT_LOCATION_NAME': sorted_output_indices[0],
+                'OUTPUT_CATEGORY_NAME': sorted_output_indices[1],
+                'OUTPUT_SCORE_NAME': sorted_output_indices[2],
+                'OUTPUT_NUMBER_NAME': sorted_output_indices[3],
+            }
+
+            height, width = self.input_detail['shape'][1:3]
+            self.resized_image = np.empty((height, width, self.input_detail['shape'][3]), dtype=np.uint8)
+
+    MODEL_NAME = 'detection'
+
+    def __init__(self, gui: GUI, slots_count=2, scheduler: Optional[VisionScheduler] = None):
+        """
+        Args:
+            gui: GUI instance
+            slots_count: number of frames that can be processed at once (each slot has its own interpreter, so one
+                         frame can be resized while another is being inferred)
+            scheduler: scheduler running the asynchronous detections (the model must be registered with MODEL_NAME);
+                       its thread budget is used by each slot's interpreter
+        """
         self.__gui = gui
-
-        self.__detection_process: Optional[Thread] = None
+        self.__scheduler = scheduler
 
         self.__options = dict({
             'num_threads': 4,
@@ -80,6 +153,7 @@ class ObjectDetector:
         file_name = displayer.get_packed_associated_file_list()[0]
         label_map_file = displayer.get_associated_file_buffer(file_name).decode()
         self.__label_list = list(filter(len, label_map_file.splitlines()))
+        self.__allowed_classes_mask: Optional[np.ndarray] = None
         # print("Labels:", self.__label_list) # 'cat', 'dog', 'horse', 'sheep', 'cow', 'bear', 'zebra', 'teddy bear'...
 
         # Initialize TFLite model.
@@ -91,97 +165,186 @@ class ObjectDetector:
         #       experimental_delegates=[load_delegate(edgetpu_lib_name())],
         #       num_threads=options.num_threads)
         # else:
-        self.__interpreter = Interpreter(model_path=model_path, num_threads=self.__options["num_threads"])
-
-        self.__interpreter.allocate_tensors()
-        input_detail = self.__interpreter.get_input_details()[0]
-
-        # From TensorFlow 2.6, the order of the outputs become undefined.
-        # Therefore, we need to sort the tensor indices of TFLite outputs and to know
-        # exactly the meaning of each output tensor. For example, if
-        # output indices are [601, 599, 598, 600], tensor names and indices aligned
-        # are:
-        #   - location: 598
-        #   - category: 599
-        #   - score: 600
-        #   - detection_count: 601
-        # because of the op's ports of TFLITE_DETECTION_POST_PROCESS
-        # (https://github.com/tensorflow/tensorflow/blob/a4fe268ea084e7d323133ed7b986e0ae259a2bc7/tensorflow/lite/kernels/detection_postprocess.cc#L47-L50).
-        sorted_output_indices = sorted(
-            [output['index'] for output in self.__interpreter.get_output_details()])
-        self.__output_indices = {
-            'OUTPUT_LOCATION_NAME': sorted_output_indices[0],
-            'OUTPUT_CATEGORY_NAME': sorted_output_indices[1],
-            'OUTPUT_SCORE_NAME': sorted_output_indices[2],
-            'OUTPUT_NUMBER_NAME': sorted_output_indices[3],
-        }
-
+        # CPU threads are split between the slots
+        num_threads = scheduler.get_threads(ObjectDetector.MODEL_NAME) if scheduler is not None else \
+            max(1, self.__options['num_threads'] // slots_count)
+        self.__slots_count = slots_count
+        self.__free_slots: Queue[ObjectDetector.__Slot] = Queue()
+        for _ in range(slots_count):
+            self.__free_slots.put(ObjectDetector.__Slot(model_path, num_threads))
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        if scheduler is None:
+            self.__executor = ThreadPoolExecutor(max_workers=slots_count, thread_name_prefix='ObjectDetector')
+
+        slot = self.__free_slots.queue[0]
+        input_detail = slot.input_detail
         self.__input_size = input_detail['shape'][2], input_detail['shape'][1]
         self.__is_quantized_input = input_detail['dtype'] == np.uint8
 
-    def close(self):
-        pass
-
-    def detect(self, input_image: np.ndarray) -> List[Detection]:
-        image_height, image_width, _ = input_image.shape
-
-        input_tensor = self.__preprocess(input_image)
+        # Models with other input types get the resized image mapped through a lookup table which also applies
+        # normalization (and quantization for integer inputs), so no temporary arrays are created per frame
+        self.__input_lookup_table: Optional[np.ndarray] = None
+        if not self.__is_quantized_input:
+            self.__input_lookup_table = self.__create_input_lookup_table(input_detail)
+
+    @property
+    def slots_count(self):
+        return self.__slots_count
+
+    def set_allowed_labels(self, labels: Optional[Iterable[str]]):
+        """
+        Args:
+            labels: labels of objects that should be returned by the detector (None allows all of them)
+        """
+        if labels is None:
+            self.__allowed_classes_mask = None
+            return
+        labels = set(labels)
+        self.__allowed_classes_mask = np.array([label in labels for label in self.__label_list], dtype=bool)
 
-        self.__set_input_tensor(input_tensor)
-        self.__interpreter.invoke()
+    def close(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+
+    def detect(self, input_image: np.ndarray, region: Optional[Rect] = None) -> List[Detection]:
+        """
+        Args:
+            input_image: image to detect objects in
+            region: part of the image to detect objects in (eg. from get_region_around), so small objects are not
+                    downscaled as much as in the whole image
+
+        Returns: detections with bounding boxes in the input image coordinates
+        """
+        slot = self.__free_slots.get()
+        try:
+            return self.__infer(slot, *self.__preprocess(slot, input_image, region))
+        finally:
+            self.__free_slots.put(slot)
+
+    def detect_async(self, input_image: np.ndarray, sequence_number=0, timestamp=0.,
+                     region: Optional[Rect] = None) -> 'Future[DetectionResult]':
+        """
+        Resizes the image into a free slot and queues it for inference. Frames are processed by the slots in parallel,
+        so results might be completed out of order and should be matched by their sequence numbers.
+        The call blocks while all slots are busy.
+
+        Args:
+            input_image: image to detect objects in (it is not referenced after the call returns, so it can be a view
+                         into a reused camera buffer)
+            sequence_number: sequence number of the source frame
+            timestamp: capture timestamp of the source frame
+            region: part of the image to detect objects in
+
+        Returns: future of the detection result
+        """
+        # Resizing happens on the calling thread, so the next frame is resized while the previous one is inferred
+        slot = self.__free_slots.get()
+        try:
+            image_width, image_height, offset = self.__preprocess(slot, input_image, region)
+        except Exception:
+            self.__free_slots.put(slot)
+            raise
+
+        def infer():
+            try:
+                return DetectionResult(self.__infer(slot, image_width, image_height, offset), sequence_number,
+                                       timestamp, region)
+            finally:
+                self.__free_slots.put(slot)
+
+        try:
+            if self.__scheduler is not None:
+                future = self.__scheduler.submit(ObjectDetector.MODEL_NAME, infer)
+            else:
+                future = self.__executor.submit(infer)
+        except Exception:
+            self.__free_slots.put(slot)
+            raise
+
+        # Cancelled requests are never run, so their slot has to be released here
+        future.add_done_callback(lambda f: self.__free_slots.put(slot) if f.cancelled() else None)
+        return future
+
+    def __infer(self, slot: __Slot, image_width: int, image_height: int,
+                offset: tuple[int, int]) -> List[Detection]:
+        slot.interpreter.invoke()
 
         # Get all output details
-        boxes = self.__get_output_tensor('OUTPUT_LOCATION_NAME')
-        classes = self.__get_output_tensor('OUTPUT_CATEGORY_NAME')
-        scores = self.__get_output_tensor('OUTPUT_SCORE_NAME')
-        count = int(self.__get_output_tensor('OUTPUT_NUMBER_NAME'))
-
-        return self.__postprocess(boxes, classes, scores, count, image_width, image_height)
-
-    def __preprocess(self, input_image: np.ndarray) -> np.ndarray:
-        # Resize the input
-        input_tensor = cv2.resize(input_image, self.__input_size)
-
-        # Normalize the input if it's a float model (aka. not quantized)
-        if not self.__is_quantized_input:
-            input_tensor = (np.float32(input_tensor) - self.__mean) / self.__std
+        boxes = self.__get_output_tensor(slot, 'OUTPUT_LOCATION_NAME')
+        classes = self.__get_output_tensor(slot, 'OUTPUT_CATEGORY_NAME')
+        scores = self.__get_output_tensor(slot, 'OUTPUT_SCORE_NAME')
+        count = int(self.__get_output_tensor(slot, 'OUTPUT_NUMBER_NAME'))
+
+        return self.__postprocess(boxes, classes, scores, count, image_width, image_height, offset)
+
+    def __create_input_lookup_table(self, input_detail: dict) -> np.ndarray:
+        lookup_table = (np.arange(256, dtype=np.float32) - self.__mean) / self.__std
+
+        if np.issubdtype(input_detail['dtype'], np.integer):
+            scale, zero_point = input_detail['quantization']
+            if scale > 0:
+                lookup_table = lookup_table / scale + zero_point
+            type_info = np.iinfo(input_detail['dtype'])
+            lookup_table = np.clip(np.rint(lookup_table), type_info.min, type_info.max)
+
+        return lookup_table.astype(input_detail['dtype'])
+
+    def __preprocess(self, slot: __Slot, input_image: np.ndarray,
+                     region: Optional[Rect]) -> tuple[int, int, tuple[int, int]]:
+        """
+        Resizes the image (or its region) directly into the slot's input tensor
+
+        Returns: width and height of the processed image part and its offset in the input image
+        """
+        offset = (0, 0)
+        if region is not None:
+            input_image = input_image[int(region.top):int(region.bottom), int(region.left):int(region.right)]
+            offset = (int(region.left), int(region.top))
+        image_height, image_width, _ = input_image.shape
 
-        # Add batch dimension
-        input_tensor = np.expand_dims(input_tensor, axis=0)
+        # The view must not be kept while the interpreter is invoked
+        input_tensor = slot.interpreter.tensor(slot.input_index)()[0]
 
-        return input_tensor
+        if self.__is_quantized_input:
+            cv2.resize(input_image, self.__input_size, dst=input_tensor)
+        else:
+            cv2.resize(input_image, self.__input_size, dst=slot.resized_image)
+            np.take(self.__input_lookup_table, slot.resized_image, out=input_tensor)
 
-    def __set_input_tensor(self, image):
-        """Sets the input tensor."""
-        tensor_index = self.__interpreter.get_input_details()[0]['index']
-        input_tensor = self.__interpreter.tensor(tensor_index)()[0]
-        input_tensor[:, :] = image
+        return image_width, image_height, offset
 
-    def __get_output_tensor(self, name: str):
+    @staticmethod
+    def __get_output_tensor(slot: __Slot, name: str):
         """Returns the output tensor at the given index."""
-        output_index = self.__output_indices[name]
-        tensor = np.squeeze(self.__interpreter.get_tensor(output_index))
+        output_index = slot.output_indices[name]
+        tensor = np.squeeze(slot.interpreter.get_tensor(output_index))
         return tensor
 
     def __postprocess(self, boxes: np.ndarray, classes: np.ndarray, scores: np.ndarray, count: int, image_width: int,
-                      image_height: int) -> List[Detection]:
-        results: List[Detection] = []
+                      image_height: int, offset: tuple[int, int] = (0, 0)) -> List[Detection]:
+        boxes = boxes[:count]
+        classes = classes[:count].astype(np.int32)
+        scores = scores[:count]
+
+        mask = scores >= self.__options['score_threshold']
+        mask &= (classes >= 0) & (classes < len(self.__label_list))
+        allowed_classes_mask = self.__allowed_classes_mask
+        if allowed_classes_mask is not None:
+            mask &= allowed_classes_mask[np.clip(classes, 0, len(allowed_classes_mask) - 1)]
+
+        # Sort detection results by score descending
+        indices = np.flatnonzero(mask)
+        indices = indices[np.argsort(-scores[indices], kind='stable')][:self.__options['max_results']]
+
+        # Boxes are in (y_min, x_min, y_max, x_max) format normalized to the input image size
+        scaled_boxes = (boxes[indices] * (image_height, image_width, image_height, image_width)).astype(np.int32) + \
+            (offset[1], offset[0], offset[1], offset[0])
 
         # Parse the model output into a list of Detection entities.
-        for i in range(count):
-            if scores[i] >= self.__options["score_threshold"]:
-                y_min, x_min, y_max, x_max = boxes[i]
-                bounding_box = Rect(
-                    top=int(y_min * image_height),
-                    left=int(x_min * image_width),
-                    bottom=int(y_max * image_height),
-                    right=int(x_max * image_width))
-                class_id = int(classes[i])
-                category = Category(score=scores[i], label=str(self.__label_list[class_id]), index=class_id)
-                result = Detection(bounding_box=bounding_box, categories=[category])
-                results.append(result)
-
-        # Sort detection results by score ascending
-        sorted_results = sorted(results, key=lambda detection: detection.categories[0].score, reverse=True)
-
-        return sorted_results
+        return [
+            Detection(
+                bounding_box=Rect(top=int(top), left=int(left), bottom=int(bottom), right=int(right)),
+                categories=[Category(score=float(score), label=str(self.__label_list[class_id]), index=int(class_id))]
+            ) for (top, left, bottom, right), class_id, score in
+            zip(scaled_boxes, classes[indices], scores[indices])
+        ]
@@ -0,0 +1,164 @@
+import numpy as np
+
+from threading import Lock
+from typing import Optional, List, NamedTuple
+from src.object_detection.objectDetector import Detection, Rect
+
+
+class TrackedObject(NamedTuple):
+    """Estimated state of a tracked object at a given time."""
+    bounding_box: Rect
+    label: str
+    score: float
+    velocity: tuple[float, float]
+    """Velocity of the box center in pixels per second"""
+    age: float
+    """Time in seconds since the object was last detected"""
+
+
+def intersection_over_union(a: Rect, b: Rect) -> float:
+    intersection_width = min(a.right, b.right) - max(a.left, b.left)
+    intersection_height = min(a.bottom, b.bottom) - max(a.top, b.top)
+    if intersection_width <= 0 or intersection_height <= 0:
+        return 0.
+    intersection = intersection_width * intersection_height
+    union = (a.right - a.left) * (a.bottom - a.top) + (b.right - b.left) * (b.bottom - b.top) - intersection
+    return intersection / union if union > 0 else 0.
+
+
+class ObjectTracker:
+    """
+    Associates detections between frames by IoU and estimates each object's box with a constant velocity Kalman
+    filter, so object positions can be predicted between (or without) detector runs.
+    Detections can be added and predictions queried from different threads.
+    """
+
+    class __Track:
+        # State: center x, center y, width, height, velocity x, velocity y
+        __PROCESS_NOISE = np.diag([1., 1., 1., 1., 50., 50.]) ** 2
+        __MEASUREMENT_NOISE = np.diag([4., 4., 8., 8.]) ** 2
+        __MEASUREMENT_MATRIX = np.eye(4, 6)
+
+        def __init__(self, detection: Detection, timestamp: float):
+            self.state = np.zeros(6)
+            self.state[:4] = self.__box_to_measurement(detection.bounding_box)
+            self.covariance = np.diag([4., 4., 8., 8., 200., 200.]) ** 2
+            self.timestamp = timestamp
+            self.last_detection_timestamp = timestamp
+            self.label = detection.categories[0].label
+            self.score = detection.categories[0].score
+
+        @staticmethod
+        def __box_to_measurement(box: Rect):
+            return np.array([(box.left + box.right) / 2, (box.top + box.bottom) / 2, box.right - box.left,
+                             box.bottom - box.top])
+
+        @staticmethod
+        def __transition(dt: float):
+            transition = np.eye(6)
+            transition[0, 4] = transition[1, 5] = dt
+            return transition
+
+        def predicted(self, timestamp: float) -> tuple[np.ndarray, np.ndarray]:
+            dt = max(0., timestamp - self.timestamp)
+            transition = self.__transition(dt)
+            return (transition @ self.state,
+                    transition @ self.covariance @ transition.T + self.__PROCESS_NOISE * max(dt, 1e-3))
+
+        def predict(self, timestamp: float):
+            self.state, self.covariance = self.predicted(timestamp)
+            self.timestamp = max(self.timestamp, timestamp)
+
+        def correct(self, detection: Detection, timestamp: float):
+            self.predict(timestamp)
+            measurement_matrix = self.__MEASUREMENT_MATRIX
+            residual = self.__box_to_measurement(detection.bounding_box) - measurement_matrix @ self.state
+            residual_covariance = measurement_matrix @ self.covariance @ measurement_matrix.T + \
+                self.__MEASUREMENT_NOISE
+            gain = self.covariance @ measurement_matrix.T @ np.linalg.inv(residual_covariance)
+            self.state = self.state + gain @ residual
+            self.covariance = (np.eye(6) - gain @ measurement_matrix) @ self.covariance
+
+            self.last_detection_timestamp = max(self.last_detection_timestamp, timestamp)
+            self.label = detection.categories[0].label
+            self.score = detection.categories[0].score
+
+        def box(self, state: Optional[np.ndarray] = None):
+            center_x, center_y, width, height = map(float, (self.state if state is None else state)[:4])
+            width, height = max(0., width), max(0., height)
+            return Rect(left=center_x - width / 2, top=center_y - height / 2, right=center_x + width / 2,
+                        bottom=center_y + height / 2)
+
+    def __init__(self, iou_threshold=0.2, max_age=1.0):
+        """
+        Args:
+            iou_threshold: minimum IoU of a detection with the predicted box of a track to be associated with it
+            max_age: time in seconds after which an object that has not been detected is forgotten
+        """
+        self.__iou_threshold = iou_threshold
+        self.__max_age = max_age
+        self.__tracks: List[ObjectTracker.__Track] = []
+        self.__lock = Lock()
+
+    def reset(self):
+        with self.__lock:
+            self.__tracks = []
+
+    def update(self, detections: List[Detection], timestamp: float):
+        """
+        Associates detections of a single frame with the tracked objects
+
+        Args:
+            detections: detections of the frame
+            timestamp: capture time of the frame
+        """
+        with self.__lock:
+            self.__tracks = [track for track in self.__tracks if
+                             timestamp - track.last_detection_timestamp <= self.__max_age]
+
+            predicted_boxes = [track.box(track.predicted(timestamp)[0]) for track in self.__tracks]
+            candidates = sorted(
+                ((intersection_over_union(box, detection.bounding_box), track_index, detection_index)
+                 for track_index, box in enumerate(predicted_boxes)
+                 for detection_index, detection in enumerate(detections)),
+                reverse=True
+            )
+
+            # Greedy association by the highest IoU
+            matched_tracks: set[int] = set()
+            matched_detections: set[int] = set()
+            for iou, track_index, detection_index in candidates:
+                if iou < self.__iou_threshold:
+                    break
+                if track_index in matched_tracks or detection_index in matched_detections:
+                    continue
+                self.__tracks[track_index].correct(detections[detection_index], timestamp)
+                matched_tracks.add(track_index)
+                matched_detections.add(detection_index)
+
+            for detection_index, detection in enumerate(detections):
+                if detection_index not in matched_detections:
+                    self.__tracks.append(ObjectTracker.__Track(detection, timestamp))
+
+    def predict(self, timestamp: float) -> List[TrackedObject]:
+        """
+        Args:
+            timestamp: time the objects state should be estimated at
+
+        Returns: tracked objects sorted by their detection score (recently detected objects first)
+        """
+        with self.__lock:
+            objects: List[TrackedObject] = []
+            for track in self.__tracks:
+                age = timestamp - track.last_detection_timestamp
+                if age > self.__max_age:
+                    continue
+                state, _ = track.predicted(timestamp)
+                objects.append(TrackedObject(bounding_box=track.box(state), label=track.label, score=track.score,
+                                             velocity=(float(state[4]), float(state[5])), age=max(0., age)))
+
+        return sorted(objects, key=lambda tracked: tracked.score * (1. - tracked.age / self.__max_age), reverse=True)
+
+    def has_targets(self, timestamp: float) -> bool:
+        with self.__lock:
+            return any(timestamp - track.last_detection_timestamp <= self.__max_age for track in self.__tracks)
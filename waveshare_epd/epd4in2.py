@@ -31,7 +31,6 @@
 import logging
 from . import epdconfig
 from PIL import Image
-import RPi.GPIO as GPIO
 
 # Display resolution
 EPD_WIDTH       = 400
@@ -32,6 +32,8 @@ import logging
 import sys
 import time
 
+from src.hal.gpio import SimulatedGPIOBackend, get_gpio
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,11 +45,14 @@ class RaspberryPi:
     BUSY_PIN        = 24
 
     def __init__(self):
-        import spidev
-        import RPi.GPIO
+        from src.hal.spi import get_spi
+
+        self.GPIO = get_gpio()
+        self.SPI = get_spi()
 
-        self.GPIO = RPi.GPIO
-        self.SPI = spidev.SpiDev()
+        if isinstance(self.GPIO, SimulatedGPIOBackend):
+            # Simulated display is never busy (busy pin is low while busy)
+            self.GPIO.set_input_level(self.BUSY_PIN, 1)
 
     def digital_write(self, pin, value):
         self.GPIO.output(pin, value)
@@ -148,7 +153,8 @@ class JetsonNano:
         self.GPIO.cleanup([self.RST_PIN, self.DC_PIN, self.CS_PIN, self.BUSY_PIN])
 
 
-if os.path.exists('/sys/bus/platform/drivers/gpiomem-bcm2835'):
+# Simulated GPIO backend is used with simulate-hardware argument or when no GPIO library is available
+if os.path.exists('/sys/bus/platform/drivers/gpiomem-bcm2835') or isinstance(get_gpio(), SimulatedGPIOBackend):
     implementation = RaspberryPi()
 else:
     implementation = JetsonNano()